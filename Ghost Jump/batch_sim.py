@@ -0,0 +1,172 @@
+import os, sys, csv, time, argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+os.environ["SDL_VIDEODRIVER"] = "dummy"
+os.environ["SDL_AUDIODRIVER"] = "dummy"
+os.environ["PYGAME_HIDE_SUPPORT_PROMPT"] = "1"
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+import nyoba
+from nyoba import settings
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+TUNABLE = ("player_drag", "player_gravity", "shot_force", "spawn_min_time", "spawn_max_time",
+           "wave_size", "enemy_speed", "waves_per_escalation")
+COLUMNS = ("seed", "score", "wave", "ticks", "time", "dead", "shots")
+
+class SeekerInput:
+    def __init__(self, game, hover_y=500, cooldown=0.25):
+        self.game = game
+        self.hover_y = hover_y
+        self.cooldown_ticks = max(1, round(cooldown / settings.fixed_dt))
+        self.last_shot = -self.cooldown_ticks
+        self.shots = 0
+
+    def click(self):
+        pass
+
+    def target(self):
+        player = self.game.player
+        best, best_distance = None, None
+        for collectible in self.game.collectibles:
+            if collectible.collectible_type == "enemy":
+                continue
+            distance = player.position.distance_squared_to(collectible.position)
+            if best is None or distance < best_distance:
+                best, best_distance = collectible.position, distance
+        return best
+
+    def poll(self, tick):
+        player = self.game.player
+        target = self.target()
+        if target is None:
+            target = nyoba.Vector2(player.position.x, 200)
+        aim = (2 * player.position.x - target.x, 2 * player.position.y - target.y)
+        if tick - self.last_shot < self.cooldown_ticks:
+            return aim, 0
+        falling = player.velocity.y < 0
+        if player.position.y < self.hover_y and not (falling and player.position.y > target.y):
+            return aim, 0
+        self.last_shot = tick
+        self.shots += 1
+        return aim, 1
+
+def init_worker(overrides):
+    settings.headless = True
+    settings.selected_character = "data/images/Player1.png"
+    for key, value in overrides.items():
+        setattr(settings, key, value)
+    nyoba.init_display(headless=True)
+
+def run_batch(seeds, max_ticks):
+    columns = {column: [] for column in COLUMNS}
+    for seed in seeds:
+        game = nyoba.Game(nyoba.screen, headless=True, run=False, seed=seed)
+        game.input = SeekerInput(game)
+        result = game.simulate(max_ticks)
+        columns["seed"].append(seed)
+        columns["score"].append(result["score"])
+        columns["wave"].append(result["wave"])
+        columns["ticks"].append(result["ticks"])
+        columns["time"].append(result["time"])
+        columns["dead"].append(int(result["dead"]))
+        columns["shots"].append(game.input.shots)
+    return columns
+
+def parse_override(text):
+    key, _, value = text.partition("=")
+    if key not in TUNABLE or not value:
+        raise argparse.ArgumentTypeError(f"expected one of {', '.join(TUNABLE)} as KEY=VALUE, got {text!r}")
+    default = getattr(settings, key)
+    if isinstance(default, tuple):
+        return key, tuple(type(default[0])(part) for part in value.split(","))
+    return key, type(default)(value)
+
+def positive_int(text):
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"expected a value of at least 1, got {text!r}")
+    return value
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def summarize(name, values):
+    mean = sum(values) / len(values)
+    deviation = (sum((value - mean) ** 2 for value in values) / len(values)) ** 0.5
+    print(f"{name}: mean {mean:.2f}, std {deviation:.2f}, p10 {percentile(values, 0.1)}, "
+          f"p50 {percentile(values, 0.5)}, p90 {percentile(values, 0.9)}, max {max(values)}")
+
+def histogram(values, bins=10, width=40):
+    low, high = min(values), max(values)
+    size = (high - low) / bins or 1
+    counts = [0] * bins
+    for value in values:
+        counts[min(bins - 1, int((value - low) / size))] += 1
+    peak = max(counts)
+    for index, count in enumerate(counts):
+        start = low + index * size
+        print(f"  {start:8.2f} - {start + size:8.2f} | {'#' * round(count / peak * width):<{width}} {count}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Run seeded Ghost Jump games in parallel for balancing")
+    parser.add_argument("--runs", type=positive_int, default=1000, help="number of games to simulate")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game; game i uses seed + i")
+    parser.add_argument("--ticks", type=positive_int, default=120 * 60 * 5, help="maximum ticks per game")
+    parser.add_argument("--workers", type=positive_int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--chunk", type=positive_int, default=25, help="games per task sent to a worker")
+    parser.add_argument("--output", default="batch_results.csv",
+                        help="results file, .csv or .npz (requires numpy); rows are streamed to a .csv as games finish")
+    parser.add_argument("--set", dest="overrides", action="append", type=parse_override, default=[],
+                        metavar="KEY=VALUE", help="override a tuning setting: " + ", ".join(TUNABLE))
+    args = parser.parse_args()
+
+    as_npz = args.output.endswith(".npz")
+    if as_npz and numpy is None:
+        parser.error("writing .npz requires numpy; use a .csv output")
+    overrides = dict(args.overrides)
+
+    columns = {column: [] for column in COLUMNS}
+    csv_path = args.output + ".partial.csv" if as_npz else args.output
+    csv_file = open(csv_path, "w", newline="")
+    writer = csv.writer(csv_file)
+    writer.writerow(COLUMNS)
+
+    seeds = list(range(args.seed, args.seed + args.runs))
+    chunks = [seeds[index:index + args.chunk] for index in range(0, len(seeds), args.chunk)]
+    start_time = time.perf_counter()
+    with ProcessPoolExecutor(args.workers, initializer=init_worker, initargs=(overrides,)) as executor:
+        futures = [executor.submit(run_batch, chunk, args.ticks) for chunk in chunks]
+        for future in as_completed(futures):
+            batch = future.result()
+            for column in COLUMNS:
+                columns[column].extend(batch[column])
+            writer.writerows(zip(*(batch[column] for column in COLUMNS)))
+            csv_file.flush()
+            print(f"\r{len(columns['seed'])}/{args.runs} games", end="", file=sys.stderr)
+    elapsed = time.perf_counter() - start_time
+    print(file=sys.stderr)
+
+    csv_file.close()
+    if as_npz:
+        order = numpy.argsort(columns["seed"])
+        numpy.savez_compressed(args.output, **{column: numpy.asarray(columns[column])[order] for column in COLUMNS})
+        os.remove(csv_path)
+
+    print(f"Simulated {args.runs} games on {args.workers} workers in {elapsed:.2f} s "
+          f"({args.runs / elapsed * 60:.0f} games/min) -> {args.output}")
+    if overrides:
+        print("Overrides:", ", ".join(f"{key}={value}" for key, value in overrides.items()))
+    summarize("Score", columns["score"])
+    histogram(columns["score"])
+    summarize("Survival (s)", columns["time"])
+    histogram(columns["time"])
+    print(f"Survived the full {args.ticks * settings.fixed_dt:.0f} s: {columns['dead'].count(0)} of {args.runs}")
+
+if __name__ == "__main__":
+    main()
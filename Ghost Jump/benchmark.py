@@ -0,0 +1,276 @@
+import os, sys, json, time, random, platform, argparse, tracemalloc, subprocess
+from contextlib import redirect_stdout
+
+os.environ["SDL_VIDEODRIVER"] = "dummy"
+os.environ["SDL_AUDIODRIVER"] = "dummy"
+os.environ["PYGAME_HIDE_SUPPORT_PROMPT"] = "1"
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+import pygame
+import nyoba
+from nyoba import settings, profiler
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+FRAME_TIME = 1 / 60
+
+class HoverInput:
+    def __init__(self, clicks_per_second=2, hover_y=400):
+        self.game = None
+        self.click_interval = max(1, round(1 / (clicks_per_second * settings.fixed_dt)))
+        self.hover_y = hover_y
+        self.last_click = -self.click_interval
+
+    def click(self):
+        pass
+
+    def poll(self, tick):
+        player = self.game.player
+        below = player.position.y > self.hover_y
+        aim = (player.position.x, player.position.y + (150 if below else -150))
+        if tick - self.last_click < self.click_interval:
+            return aim, 0
+        if below and player.velocity.y > 0:
+            return aim, 0
+        self.last_click = tick
+        return aim, 1
+
+class RapidFireInput(HoverInput):
+    def poll(self, tick):
+        player = self.game.player
+        aim = (player.position.x + (40 if tick % 2 else -40), player.position.y + (150 if player.position.y > self.hover_y else -150))
+        if tick - self.last_click < self.click_interval:
+            return aim, 0
+        self.last_click = tick
+        return aim, 1
+
+def new_game(screen, input_source):
+    game = nyoba.Game(screen, input_source, run=False)
+    input_source.game = game
+    game.player.gun.soul_count = 10 ** 9
+    game.player.ignore_enemy_collision(10 ** 9)
+    return game
+
+def game_frame(game):
+    def frame():
+        game.run_frame(FRAME_TIME)
+    return frame
+
+def idle_hover(screen):
+    return game_frame(new_game(screen, HoverInput()))
+
+def rapid_fire(screen):
+    return game_frame(new_game(screen, RapidFireInput(clicks_per_second=20)))
+
+def wave_50(screen):
+    game = new_game(screen, HoverInput())
+    game.wave_iteration = 50
+    game.min_time, game.max_time = 1, 2
+    game.spawn_enemies(400)
+    height = game.world_size[1]
+    for collectible in game.collectibles:
+        if collectible.collectible_type == "enemy":
+            collectible.position.y = random.randint(-35, height - 60)
+            collectible.save_position()
+            collectible.bounds.y = int(collectible.position.y)
+            game.spatial_hash.move(collectible)
+    if game.enemies is not None:
+        game.enemies.positions[:game.enemies.count, 1] = [random.randint(-35, height - 60) for _ in range(game.enemies.count)]
+        game.enemies.save_positions()
+    return game_frame(game)
+
+def menu_navigation(screen):
+    settings.is_menu = True
+    menu = nyoba.Menu(screen, run=False)
+    selection = nyoba.SelectionScreen(screen, run=False)
+
+    def select(mode):
+        selection.mode = mode
+
+    steps = [
+        lambda: setattr(menu, "instructions_visible", True),
+        lambda: setattr(menu, "instructions_visible", False),
+        lambda: menu.handle_main_menu_events(menu.settings_button_rect.center),
+        lambda: menu.handle_settings_menu_events(menu.volume_up_button_rect.center),
+        lambda: menu.handle_settings_menu_events(menu.back_button_rect.center),
+        lambda: menu.handle_main_menu_events(menu.play_button_rect.center),
+        lambda: select("background"),
+        lambda: select("character"),
+        lambda: setattr(settings, "is_menu", True)
+    ]
+    state = {"frame": 0}
+
+    def frame():
+        if state["frame"] % 30 == 0:
+            steps[(state["frame"] // 30) % len(steps)]()
+        profiler.begin_frame()
+        start = profiler.start()
+        if settings.is_menu or menu.is_settings_menu:
+            menu.draw_frame()
+        else:
+            selection.draw_frame()
+        profiler.stop("draw", start)
+        start = profiler.start()
+        nyoba.display.flip()
+        profiler.stop("flip", start)
+        profiler.end_frame()
+        state["frame"] += 1
+    return frame
+
+SCENARIOS = {
+    "idle_hover": idle_hover,
+    "rapid_fire": rapid_fire,
+    "wave_50": wave_50,
+    "menu_navigation": menu_navigation
+}
+
+def reset_state(seed):
+    random.seed(seed)
+    settings.is_menu = False
+    settings.is_character_selection = False
+    settings.is_background_selection = False
+    settings.is_paused = False
+    settings.selected_character = "data/images/Player1.png"
+    settings.selected_background = "data/images/latargame.jpg"
+
+def run_scenario(screen, name, frames, seed):
+    reset_state(seed)
+    frame = SCENARIOS[name](screen)
+    profiler.window = frames
+    profiler.reset()
+    profiler.enabled = True
+    caches_before = nyoba.cache_stats()
+    start_time = time.perf_counter()
+    for _ in range(frames):
+        frame()
+    elapsed = time.perf_counter() - start_time
+    profiler.enabled = False
+    caches = {cache: {key: value - caches_before[cache][key] for key, value in stats.items()} for cache, stats in nyoba.cache_stats().items()}
+    phases = {}
+    for phase, samples in profiler.samples.items():
+        p50, p95, p99 = profiler.percentiles(phase)
+        phases[phase] = {"mean": round(sum(samples) / len(samples), 4), "p50": round(p50, 4), "p95": round(p95, 4), "p99": round(p99, 4)}
+    frame_ms = phases.pop("frame")
+
+    reset_state(seed)
+    frame = SCENARIOS[name](screen)
+    tracemalloc.start()
+    surface_peak = nyoba.surfaces.total_bytes()
+    for _ in range(max(1, frames // 4)):
+        frame()
+        surface_peak = max(surface_peak, nyoba.surfaces.total_bytes())
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        "frames": frames,
+        "seconds": round(elapsed, 4),
+        "fps": round(frames / elapsed, 2),
+        "frame_ms": frame_ms,
+        "phases": phases,
+        "peak_memory_kb": round(peak / 1024, 1),
+        "surface_memory_kb": round(surface_peak / 1024, 1),
+        "max_rss_kb": max_rss_kb(),
+        "caches": caches
+    }
+
+def max_rss_kb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / 1024, 1) if sys.platform == "darwin" else rss
+
+def cold_start(runs):
+    wall, first_frame = [], []
+    for _ in range(runs):
+        start_time = time.perf_counter()
+        output = subprocess.run([sys.executable, "nyoba.py", "--startup-time"], capture_output=True, text=True, check=True).stdout
+        wall.append((time.perf_counter() - start_time) * 1000)
+        for line in output.splitlines():
+            if line.startswith("First menu frame after"):
+                first_frame.append(float(line.split()[4]))
+    wall.sort()
+    first_frame.sort()
+    return {
+        "runs": runs,
+        "process_ms": round(wall[len(wall) // 2], 1),
+        "first_frame_ms": round(first_frame[len(first_frame) // 2], 1) if first_frame else None
+    }
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    cold, base_cold = results.get("cold_start"), baseline.get("cold_start")
+    if cold and base_cold and cold["process_ms"] > base_cold["process_ms"] * (1 + tolerance):
+        regressions.append(f"cold start: {cold['process_ms']} ms > baseline {base_cold['process_ms']} ms")
+    for name, result in results["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if base is None:
+            continue
+        if result["fps"] < base["fps"] * (1 - tolerance):
+            regressions.append(f"{name}: fps {result['fps']} < baseline {base['fps']}")
+        if result["frame_ms"]["p95"] > base["frame_ms"]["p95"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 frame {result['frame_ms']['p95']} ms > baseline {base['frame_ms']['p95']} ms")
+        for key, label in (("peak_memory_kb", "peak memory"), ("surface_memory_kb", "surface memory"), ("max_rss_kb", "max RSS")):
+            if result.get(key) and base.get(key) and result[key] > base[key] * (1 + tolerance):
+                regressions.append(f"{name}: {label} {result[key]} KB > baseline {base[key]} KB")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Ghost Jump performance benchmarks")
+    parser.add_argument("scenarios", nargs="*", default=list(SCENARIOS), help="scenarios to run: " + ", ".join(SCENARIOS))
+    parser.add_argument("--frames", type=int, default=600, help="frames per scenario")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--numpy-enemies", action="store_true", help="use the NumPy enemy backend")
+    parser.add_argument("--output", help="write results JSON to this file instead of stdout")
+    parser.add_argument("--baseline", help="compare against a stored results JSON and exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative slowdown before flagging a regression")
+    parser.add_argument("--cold-start", type=int, default=0, metavar="RUNS", help="also time RUNS fresh processes from launch to the first menu frame")
+    args = parser.parse_args()
+
+    for name in args.scenarios:
+        if name not in SCENARIOS:
+            parser.error(f"unknown scenario: {name}")
+
+    settings.headless = True
+    settings.numpy_enemies = args.numpy_enemies
+    nyoba.surfaces.enabled = True
+    screen = nyoba.init_display(headless=True)
+
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "numpy_enemies": args.numpy_enemies
+        },
+        "scenarios": {}
+    }
+    with redirect_stdout(sys.stderr):
+        for name in args.scenarios:
+            results["scenarios"][name] = run_scenario(screen, name, args.frames, args.seed)
+        if args.cold_start:
+            results["cold_start"] = cold_start(args.cold_start)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(output)
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline, "r") as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print("Regression:", regression, file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print("No regressions against", args.baseline, file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import os, json, glob, struct, argparse
+
+os.environ["SDL_VIDEODRIVER"] = "dummy"
+os.environ["PYGAME_HIDE_SUPPORT_PROMPT"] = "1"
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+import pygame
+import nyoba
+from nyoba import settings, BUNDLE_PATH, BUNDLE_MAGIC, ATLAS_PATH, ATLAS_SPRITES
+
+ALIGNMENT = 64
+
+def bundle_keys(window_sizes):
+    paths = sorted(path.replace(os.sep, "/") for path in glob.glob("data/images/*"))
+    keys = [(path, None) for path in paths]
+    characters = [path for path in paths if os.path.basename(path).startswith("Player")]
+    backgrounds = [path for path in paths if os.path.basename(path).startswith("latargame")]
+    for window_size in window_sizes:
+        for character in characters:
+            for background in backgrounds:
+                settings.selected_character = character
+                settings.selected_background = background
+                for item in nyoba.game_manifest(window_size):
+                    if item[0] == "image" and item[2] is not None:
+                        keys.append((item[1], tuple(item[2])))
+    return list(dict.fromkeys(keys))
+
+def build(output, window_sizes):
+    sources = {}
+    entries = []
+    blobs = []
+    offset = 0
+    for path, size in bundle_keys(window_sizes):
+        if path not in sources:
+            sources[path] = pygame.image.load(path)
+        source = sources[path]
+        surface = pygame.transform.scale(source, size) if size else source
+        pixel_format = "RGBA" if source.get_flags() & pygame.SRCALPHA else "RGB"
+        pixels = pygame.image.tobytes(surface, pixel_format)
+        stat = os.stat(path)
+        entries.append({
+            "path": path,
+            "size": list(size) if size else None,
+            "width": surface.get_width(),
+            "height": surface.get_height(),
+            "format": pixel_format,
+            "offset": offset,
+            "length": len(pixels),
+            "source_size": stat.st_size,
+            "source_mtime": int(stat.st_mtime)
+        })
+        padding = -len(pixels) % ALIGNMENT
+        blobs.append(pixels + bytes(padding))
+        offset += len(pixels) + padding
+
+    index = json.dumps(entries, separators=(",", ":")).encode()
+    header_length = 12 + len(index)
+    data_start = header_length + (-header_length % ALIGNMENT)
+
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    temporary = output + ".tmp"
+    with open(temporary, "wb") as bundle_file:
+        bundle_file.write(struct.pack("<4sII", BUNDLE_MAGIC, len(index), data_start) + index)
+        bundle_file.write(bytes(data_start - header_length))
+        for blob in blobs:
+            bundle_file.write(blob)
+    os.replace(temporary, output)
+    return entries, data_start + offset
+
+def build_atlas(output):
+    atlas = nyoba.SpriteAtlas.build(ATLAS_SPRITES)
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    atlas.save(output)
+    return atlas
+
+def parse_size(text):
+    width, _, height = text.partition("x")
+    return int(width), int(height)
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack data/images into a pre-scaled raw-pixel bundle and a sprite atlas")
+    parser.add_argument("--output", default=BUNDLE_PATH)
+    parser.add_argument("--atlas", default=ATLAS_PATH, help="sprite atlas image; its index is written next to it as .json")
+    parser.add_argument("--window", type=parse_size, action="append", metavar="WxH",
+                        help="window size to pre-scale game backgrounds for (default 800x800)")
+    args = parser.parse_args()
+    entries, total = build(args.output, args.window or [(800, 800)])
+    print(f"Wrote {len(entries)} images ({total / 1024 / 1024:.1f} MB) to {args.output}")
+    atlas = build_atlas(args.atlas)
+    print(f"Wrote {len(atlas.entries)} sprites ({atlas.surface.get_width()}x{atlas.surface.get_height()}) to {args.atlas}")
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,170 @@
-import pygame, sys, math, random, time
+import time
+STARTUP_TIME = time.perf_counter()
+
+import pygame, sys, os, math, random, argparse, json, struct, zlib, threading, queue, mmap, sqlite3, weakref
 from pygame import Vector2
 from pygame import mixer
 from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+BUNDLE_PATH = "data/bundle/images.bin"
+BUNDLE_MAGIC = b"GJIB"
+ATLAS_PATH = "data/bundle/atlas.png"
+SCORES_PATH = "data/serialisation/scores.db"
+SOUND_CATEGORIES = {
+    "gun": (4, 1),
+    "pickup": (2, 2),
+    "ui": (2, 3)
+}
+HIGHSCORE_PATH = "data/serialisation/highscore.txt"
+ATLAS_SPRITES = [
+    ("data/images/Soul.png", (30, 40)),
+    ("data/images/Baby.png", (70, 80)),
+    ("data/images/shield.png", (40, 50)),
+    ("data/images/Nail.png", (30, 50)),
+    ("data/images/Fish.png", (30, 50)),
+    ("data/images/Gun.png", (200, 200)),
+    ("data/images/Player1.png", (50, 60)),
+    ("data/images/Player2.png", (50, 60)),
+    ("data/images/Player3.png", (50, 60)),
+    ("data/images/Player4.png", (50, 60))
+]
+
+LOGICAL_SIZE = (800, 800)
+
+class Display:
+    def __init__(self, logical_size=LOGICAL_SIZE):
+        self.logical_size = logical_size
+        self.surface = None
+        self.window = None
+        self.window_size = None
+        self.target = None
+        self.viewport = pygame.Rect((0, 0), logical_size)
+        self.viewports = {}
+        self.scaled = False
+        self.gpu_scaling = True
+        self.generation = 0
+
+    def open(self, fullscreen=False):
+        flags = pygame.FULLSCREEN if fullscreen else pygame.RESIZABLE
+        window = None
+        if self.gpu_scaling:
+            try:
+                window = pygame.display.set_mode(self.logical_size, flags | pygame.SCALED)
+            except pygame.error as e:
+                print("Error:", e)
+        if window is None:
+            pygame.display.set_mode((0, 0) if fullscreen else self.logical_size, flags)
+        if self.surface is None:
+            self.surface = surfaces.track(pygame.Surface(self.logical_size).convert(), "display")
+        self.resize()
+        return self.surface
+
+    def layout(self, size):
+        viewport = self.viewports.get(size)
+        if viewport is None:
+            logical_width, logical_height = self.logical_size
+            scale = min(size[0] / logical_width, size[1] / logical_height)
+            viewport = pygame.Rect(0, 0, max(1, round(logical_width * scale)), max(1, round(logical_height * scale)))
+            viewport.center = (size[0] // 2, size[1] // 2)
+            self.viewports[size] = viewport
+        return viewport
+
+    def resize(self):
+        self.window = pygame.display.get_surface()
+        self.window_size = self.window.get_size()
+        self.viewport = self.layout(self.window_size)
+        self.scaled = self.viewport.size != self.logical_size
+        self.window.fill((0, 0, 0))
+        self.target = self.window.subsurface(self.viewport)
+        self.generation += 1
+
+    def check_size(self):
+        window = pygame.display.get_surface()
+        if window is not self.window or window.get_size() != self.window_size:
+            self.resize()
+
+    def handle_event(self, event):
+        if event.type in (pygame.VIDEORESIZE, pygame.WINDOWSIZECHANGED):
+            self.check_size()
+            return True
+        return False
+
+    def flip(self):
+        self.check_size()
+        if self.scaled:
+            pygame.transform.scale(self.surface, self.viewport.size, self.target)
+        else:
+            self.target.blit(self.surface, (0, 0))
+        pygame.display.flip()
 
-pygame.init()
-info = pygame.display.Info()
-screen = pygame.display.set_mode((800, 800), pygame.RESIZABLE)
-pygame.display.set_caption("Ghost Jump")
+    def update(self, rects):
+        self.check_size()
+        bounds = self.surface.get_rect()
+        window_rects = []
+        for rect in rects:
+            rect = bounds.clip(rect)
+            if not rect:
+                continue
+            if self.scaled:
+                window_rect = self.scale_rect(rect)
+                if window_rect:
+                    pygame.transform.scale(self.surface.subsurface(rect), window_rect.size, self.target.subsurface(window_rect))
+            else:
+                window_rect = rect
+                self.target.blit(self.surface, rect, rect)
+            window_rects.append(window_rect.move(self.viewport.topleft))
+        pygame.display.update(window_rects)
+
+    def scale_rect(self, rect):
+        scale_x = self.viewport.width / self.logical_size[0]
+        scale_y = self.viewport.height / self.logical_size[1]
+        left, top = int(rect.left * scale_x), int(rect.top * scale_y)
+        right, bottom = math.ceil(rect.right * scale_x), math.ceil(rect.bottom * scale_y)
+        return self.target.get_rect().clip(pygame.Rect(left, top, right - left, bottom - top))
+
+    def to_logical(self, position):
+        x, y, width, height = self.viewport
+        logical_width, logical_height = self.logical_size
+        return int((position[0] - x) * logical_width / width), int((position[1] - y) * logical_height / height)
+
+    def mouse_pos(self):
+        return self.to_logical(pygame.mouse.get_pos())
+
+display = Display()
+screen = None
+
+def init_display(headless=False):
+    global screen
+    if headless:
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+        os.environ["SDL_AUDIODRIVER"] = "dummy"
+    display.gpu_scaling = not headless
+    pygame.display.init()
+    screen = display.open()
+    pygame.display.set_caption("Ghost Jump")
+    return screen
+
+def wait_events(timeout):
+    event = pygame.event.wait(timeout)
+    if event.type == pygame.NOEVENT:
+        return []
+    return [event] + pygame.event.get()
+
+def init_mixer():
+    if mixer.get_init():
+        return True
+    try:
+        mixer.init()
+    except pygame.error as e:
+        print("Error:", e)
+        return False
+    return True
 
 class Settings:
     def __init__(self):
@@ -21,24 +179,1182 @@ class Settings:
         self.selected_background = "data/images/latargame.jpg"
         self.start_game = False
         self.dt = 0.1
+        self.gun_rotation_step = 2
+        self.exact_gun_rotation = False
+        self.exit_after_first_frame = False
+        self.prebuild_rotations = False
+        self.stress_enemies = 0
+        self.numpy_enemies = False
+        self.dirty_rects = True
+        self.batch_sprites = True
+        self.sprite_groups = False
+        self.profile_path = None
+        self.seed = None
+        self.record_path = None
+        self.playback_speed = 1
+        self.headless = False
+        self.fixed_dt = 1 / 120
+        self.max_fps = 60
+        self.menu_fps = 60
+        self.idle_wait = 250
+        self.max_steps_per_frame = 8
+        self.interpolate = True
+        self.alpha = 1.0
+        self.sim_time = 0
+        self.shield_fade_steps = 32
+        self.player_drag = 100
+        self.player_gravity = 300
+        self.shot_force = 500
+        self.spawn_min_time = 5
+        self.spawn_max_time = 10
+        self.wave_size = (1, 3)
+        self.enemy_speed = (20, 40)
+        self.waves_per_escalation = 3
+        self.surface_budget = 0
+        self.surface_report_path = None
+        self.leak_waves = 5
 
     def toggle_fullscreen(self):
         self.is_fullscreen = not self.is_fullscreen
-        if self.is_fullscreen:
-            return pygame.display.set_mode((info.current_w, info.current_h), pygame.FULLSCREEN)
-        else:
-            return pygame.display.set_mode((800, 800), pygame.RESIZABLE)
+        return display.open(self.is_fullscreen)
 
     def change_volume(self, change):
         self.volume = max(0, min(1, self.volume + change))
-        mixer.music.set_volume(self.volume)
+        audio.set_music_volume(self.volume)
         print(f"Volume: {self.volume}")
 
 settings = Settings()
 
+class SurfaceTracker:
+    INTERNAL = ("AssetManager", "TextCache", "RotationCache", "Animation", "Preloader", "SpriteAtlas", "SurfaceTracker")
+
+    def __init__(self):
+        self.enabled = False
+        self.live = {}
+        self.created = 0
+        self.next_key = 0
+        self.history = []
+        self.budget_alerted = False
+
+    def track(self, surface, category):
+        if not self.enabled or surface is None:
+            return surface
+        owner, site = self.origin()
+        key = self.next_key
+        self.next_key += 1
+        self.created += 1
+        self.live[key] = (category, owner, site, surface.get_pitch() * surface.get_height())
+        weakref.finalize(surface, self.live.pop, key, None)
+        if settings.surface_budget and not self.budget_alerted and self.total_bytes() > settings.surface_budget * 1024 * 1024:
+            self.budget_alerted = True
+            print(f"Warning: surfaces use {self.total_bytes() / 1048576:.1f} MB, over the {settings.surface_budget} MB budget")
+            print(self.report())
+        return surface
+
+    def origin(self):
+        frame = sys._getframe(2)
+        while frame is not None:
+            owner = frame.f_locals.get("self", frame.f_locals.get("cls"))
+            name = "-" if owner is None else owner.__name__ if isinstance(owner, type) else type(owner).__name__
+            if name not in self.INTERNAL:
+                return name, f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno} {frame.f_code.co_name}"
+            frame = frame.f_back
+        return "-", "-"
+
+    def total_bytes(self):
+        return sum(record[3] for record in self.live.values())
+
+    def totals(self, field=0):
+        totals = {}
+        for record in self.live.values():
+            count, size = totals.get(record[field], (0, 0))
+            totals[record[field]] = (count + 1, size + record[3])
+        return totals
+
+    def report(self, limit=10):
+        lines = [f"Surfaces: {len(self.live)} live of {self.created} created, {self.total_bytes() / 1048576:.2f} MB"]
+        for category, (count, size) in sorted(self.totals().items(), key=lambda item: -item[1][1]):
+            lines.append(f"  {category:<10}{count:>6} {size / 1024:>10.1f} KB")
+        sites = {}
+        for category, owner, site, size in self.live.values():
+            count, total = sites.get((owner, site), (0, 0))
+            sites[(owner, site)] = (count + 1, total + size)
+        lines.append("Top call sites:")
+        for (owner, site), (count, size) in sorted(sites.items(), key=lambda item: -item[1][1])[:limit]:
+            lines.append(f"  {size / 1024:>10.1f} KB {count:>6}  {owner:<16} {site}")
+        return "\n".join(lines)
+
+    def export(self, path):
+        try:
+            with open(path, "w") as report_file:
+                report_file.write(self.report(limit=50) + "\n")
+        except OSError as e:
+            print("Error:", e)
+
+    def sample(self, wave):
+        if not self.enabled:
+            return
+        self.history.append((wave, len(self.live), self.totals()))
+        recent = self.history[-(settings.leak_waves + 1):]
+        if len(recent) <= settings.leak_waves or any(later[1] <= earlier[1] for earlier, later in zip(recent, recent[1:])):
+            return
+        first, last = recent[0][2], recent[-1][2]
+        rising = [f"{category} {first.get(category, (0, 0))[0]} -> {count}" for category, (count, _) in last.items() if count > first.get(category, (0, 0))[0]]
+        print(f"Warning: surface count rose for {settings.leak_waves} waves (wave {recent[0][0]} -> {wave}): {', '.join(rising)}")
+        self.history = self.history[-1:]
+
+surfaces = SurfaceTracker()
+
+class MouseInput:
+    def __init__(self):
+        self.clicks = 0
+
+    def click(self):
+        self.clicks += 1
+
+    def poll(self, tick):
+        clicks, self.clicks = self.clicks, 0
+        return display.mouse_pos(), clicks
+
+class ScriptedInput:
+    def __init__(self, script=None, position=(400, 0)):
+        self.script = {}
+        self.position = position
+        for tick, x, y, clicks in script or []:
+            self.script[tick] = ((x, y), clicks)
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, "r") as script_file:
+            return cls(json.load(script_file))
+
+    def click(self):
+        pass
+
+    def poll(self, tick):
+        if tick not in self.script:
+            return self.position, 0
+        self.position, clicks = self.script[tick]
+        return self.position, clicks
+
+class ImageBundle:
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, index_length, self.data_start = struct.unpack_from("<4sII", self.data, 0)
+        if magic != BUNDLE_MAGIC:
+            raise ValueError(f"{path} is not an image bundle")
+        self.entries = {}
+        for entry in json.loads(self.data[12:12 + index_length]):
+            if self.is_stale(entry):
+                continue
+            self.entries[(entry["path"], tuple(entry["size"]) if entry["size"] else None)] = entry
+
+    def is_stale(self, entry):
+        try:
+            stat = os.stat(entry["path"])
+        except OSError:
+            return True
+        return stat.st_size != entry["source_size"] or int(stat.st_mtime) != entry["source_mtime"]
+
+    def surface(self, path, size):
+        entry = self.entries.get((path, size))
+        if entry is None:
+            return None
+        start = self.data_start + entry["offset"]
+        pixels = memoryview(self.data)[start:start + entry["length"]]
+        return pygame.image.frombuffer(pixels, (entry["width"], entry["height"]), entry["format"])
+
+    def close(self):
+        self.entries.clear()
+        self.data.close()
+        self.file.close()
+
+class AssetManager:
+    def __init__(self):
+        self.images = {}
+        self.fonts = {}
+        self.sounds = {}
+        self.rotation_caches = {}
+        self.animations = {}
+        self.circles = {}
+        self.bundle = None
+        self.atlas = None
+        self.hits = 0
+        self.misses = 0
+
+    def load_bundle(self, path=BUNDLE_PATH):
+        if not os.path.exists(path):
+            return False
+        try:
+            self.bundle = ImageBundle(path)
+        except (OSError, ValueError) as e:
+            print("Error:", e)
+            return False
+        return True
+
+    def image(self, path, size=None, alpha=True):
+        key = (path, tuple(size) if size else None, alpha)
+        surface = self.images.get(key)
+        if surface is not None:
+            self.hits += 1
+            return surface
+        self.misses += 1
+        bundled = self.bundle.surface(path, key[1]) if self.bundle is not None else None
+        if bundled is not None:
+            surface = self.convert(bundled, alpha)
+        elif size is None:
+            surface = self.convert(pygame.image.load(path), alpha)
+        else:
+            surface = pygame.transform.scale(self.image(path, None, alpha), key[1])
+        self.images[key] = surfaces.track(surface, "image")
+        return surface
+
+    def convert(self, surface, alpha=True):
+        if pygame.display.get_surface() is None:
+            return surface
+        return surface.convert_alpha() if alpha else surface.convert()
+
+    def font(self, path, size):
+        key = (path, size)
+        font = self.fonts.get(key)
+        if font is not None:
+            self.hits += 1
+            return font
+        self.misses += 1
+        if not pygame.font.get_init():
+            pygame.font.init()
+        font = pygame.font.Font(path, size)
+        self.fonts[key] = font
+        return font
+
+    def sound(self, path):
+        sound = self.sounds.get(path)
+        if sound is not None:
+            self.hits += 1
+            return sound
+        self.misses += 1
+        init_mixer()
+        sound = mixer.Sound(path)
+        self.sounds[path] = sound
+        return sound
+
+    def rotations(self, path, size, step):
+        key = (path, tuple(size), step)
+        cache = self.rotation_caches.get(key)
+        if cache is None:
+            cache = RotationCache(self.image(path, size), step)
+            self.rotation_caches[key] = cache
+        return cache
+
+    def animation(self, path, size=None, frames=1, fps=0, alpha_steps=1, flip=False):
+        key = (path, tuple(size) if size else None, frames, fps, alpha_steps, flip)
+        animation = self.animations.get(key)
+        if animation is not None:
+            self.hits += 1
+            return animation
+        self.misses += 1
+        if frames == 1:
+            sheet = [self.image(path, size)]
+        else:
+            strip = self.image(path)
+            width = strip.get_width() // frames
+            sheet = [strip.subsurface((index * width, 0, width, strip.get_height())) for index in range(frames)]
+            if size is not None:
+                sheet = [surfaces.track(pygame.transform.scale(frame, key[1]), "animation") for frame in sheet]
+        animation = Animation(sheet, fps, alpha_steps, flip)
+        self.animations[key] = animation
+        return animation
+
+    def circle(self, color, radius):
+        key = (tuple(color), int(radius))
+        surface = self.circles.get(key)
+        if surface is not None:
+            self.hits += 1
+            return surface
+        self.misses += 1
+        radius = key[1]
+        surface = surfaces.track(pygame.Surface((radius * 2, radius * 2), pygame.SRCALPHA), "circle")
+        pygame.draw.circle(surface, color, (radius, radius), radius)
+        self.circles[key] = surface
+        return surface
+
+    def sprite_atlas(self):
+        if self.atlas is None:
+            self.atlas = SpriteAtlas.load(ATLAS_PATH) or SpriteAtlas.build(ATLAS_SPRITES)
+            self.atlas.install(self)
+        return self.atlas
+
+    def preload(self, manifest):
+        return Preloader(self, manifest)
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "images": len(self.images),
+            "animations": len(self.animations),
+            "fonts": len(self.fonts),
+            "sounds": len(self.sounds)
+        }
+
+    def clear(self):
+        self.images.clear()
+        self.animations.clear()
+        self.fonts.clear()
+        self.sounds.clear()
+        self.rotation_caches.clear()
+        self.circles.clear()
+        self.atlas = None
+
+class RotationCache:
+    def __init__(self, surface, step):
+        self.surface = surface
+        self.step = step
+        self.count = max(1, round(360 / step))
+        self.angle = 360 / self.count
+        self.rotations = {}
+        self.hits = 0
+        self.misses = 0
+
+    def bucket(self, degrees):
+        return round(degrees / self.angle) % self.count
+
+    def get(self, degrees):
+        bucket = self.bucket(degrees)
+        rotation = self.rotations.get(bucket)
+        if rotation is not None:
+            self.hits += 1
+            return rotation
+        self.misses += 1
+        rotated = surfaces.track(pygame.transform.rotate(self.surface, bucket * self.angle), "rotation")
+        rotation = (rotated, (rotated.get_width() // 2, rotated.get_height() // 2))
+        self.rotations[bucket] = rotation
+        return rotation
+
+    def build(self):
+        for bucket in range(self.count):
+            self.get(bucket * self.angle)
+
+class Animation:
+    def __init__(self, frames, fps=0, alpha_steps=1, flip=False):
+        self.fps = fps
+        self.count = len(frames)
+        self.alpha_steps = max(1, alpha_steps)
+        self.size = frames[0].get_size()
+        self.variants = [self.bake(frames)]
+        if flip:
+            self.variants.append(self.bake([surfaces.track(pygame.transform.flip(frame, True, False), "animation") for frame in frames]))
+
+    def bake(self, frames):
+        steps = self.alpha_steps
+        return [[self.fade(frame, (step + 1) * 255 // steps) for frame in frames] for step in range(steps - 1)] + [list(frames)]
+
+    def fade(self, frame, alpha):
+        faded = frame.copy()
+        faded.fill((255, 255, 255, alpha), special_flags=pygame.BLEND_RGBA_MULT)
+        return surfaces.track(faded, "animation")
+
+    def index(self, time):
+        return int(time * self.fps) % self.count if self.fps else 0
+
+    def frame(self, time=0, alpha=1.0, flipped=False):
+        fades = self.variants[1 if flipped and len(self.variants) > 1 else 0]
+        return fades[min(self.alpha_steps - 1, max(0, int(alpha * self.alpha_steps)))][self.index(time)]
+
+class Preloader:
+    def __init__(self, manager, manifest):
+        self.manager = manager
+        self.manifest = [item for item in manifest if not self.is_cached(item) and not self.load_bundled(item)]
+        self.loaded = 0
+        self.results = queue.Queue()
+        self.thread = threading.Thread(target=self.decode_all, daemon=True)
+        self.thread.start()
+
+    def is_cached(self, item):
+        kind = item[0]
+        if kind == "image":
+            _, path, size, alpha = item
+            return (path, tuple(size) if size else None, alpha) in self.manager.images
+        if kind == "font":
+            return item[1:] in self.manager.fonts
+        if kind == "sound":
+            return item[1] in self.manager.sounds or not mixer.get_init()
+        if kind == "rotations":
+            _, path, size, step = item
+            return (path, tuple(size), step) in self.manager.rotation_caches
+        return False
+
+    def load_bundled(self, item):
+        bundle = self.manager.bundle
+        if item[0] != "image" or bundle is None:
+            return False
+        _, path, size, alpha = item
+        if (path, tuple(size) if size else None) not in bundle.entries:
+            return False
+        self.manager.image(path, size, alpha)
+        return True
+
+    def decode_all(self):
+        sources = {}
+        for item in self.manifest:
+            try:
+                self.results.put((item, self.decode(item, sources), None))
+            except Exception as e:
+                self.results.put((item, None, e))
+
+    def decode(self, item, sources):
+        kind = item[0]
+        if kind == "image":
+            _, path, size, _ = item
+            if path not in sources:
+                sources[path] = pygame.image.load(path)
+            return sources[path], pygame.transform.scale(sources[path], size) if size else None
+        if kind == "font":
+            return None
+        if kind == "sound":
+            return mixer.Sound(item[1])
+        if kind == "rotations":
+            _, path, size, step = item
+            if path not in sources:
+                sources[path] = pygame.image.load(path)
+            scaled = pygame.transform.scale(sources[path], size)
+            count = max(1, round(360 / step))
+            return scaled, [pygame.transform.rotate(scaled, bucket * 360 / count) for bucket in range(count)]
+        raise ValueError(f"Unknown asset kind: {kind}")
+
+    def store(self, item, value):
+        manager = self.manager
+        kind = item[0]
+        if kind == "image":
+            _, path, size, alpha = item
+            source, scaled = value
+            if (path, None, alpha) not in manager.images:
+                manager.images[(path, None, alpha)] = surfaces.track(manager.convert(source, alpha), "image")
+            if scaled is not None:
+                manager.images[(path, tuple(size), alpha)] = surfaces.track(manager.convert(scaled, alpha), "image")
+        elif kind == "font":
+            manager.font(*item[1:])
+        elif kind == "sound":
+            manager.sounds[item[1]] = value
+        elif kind == "rotations":
+            _, path, size, step = item
+            scaled, rotated = value
+            if (path, tuple(size), True) not in manager.images:
+                manager.images[(path, tuple(size), True)] = surfaces.track(manager.convert(scaled), "image")
+            cache = RotationCache(manager.images[(path, tuple(size), True)], step)
+            for bucket, surface in enumerate(rotated):
+                surface = surfaces.track(manager.convert(surface), "rotation")
+                cache.rotations[bucket] = (surface, (surface.get_width() // 2, surface.get_height() // 2))
+            manager.rotation_caches[(path, tuple(size), step)] = cache
+
+    def poll(self):
+        while True:
+            try:
+                item, value, error = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if error is not None:
+                print("Error:", error)
+            else:
+                self.store(item, value)
+            self.loaded += 1
+        return self.progress
+
+    @property
+    def progress(self):
+        return self.loaded / len(self.manifest) if self.manifest else 1.0
+
+    @property
+    def done(self):
+        return self.loaded >= len(self.manifest)
+
+    def wait(self):
+        while not self.done:
+            self.thread.join(0.01)
+            self.poll()
+
+assets = AssetManager()
+
+class TextCache:
+    def __init__(self, capacity=256, max_bytes=16 * 1024 * 1024):
+        self.capacity = capacity
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font_path, size, text, antialias, color):
+        key = (font_path, size, text, tuple(color), antialias)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+        self.misses += 1
+        surface = surfaces.track(assets.font(font_path, size).render(text, antialias, color), "text")
+        self.surfaces[key] = surface
+        self.bytes += surface.get_pitch() * surface.get_height()
+        while len(self.surfaces) > 1 and (len(self.surfaces) > self.capacity or self.bytes > self.max_bytes):
+            evicted = self.surfaces.popitem(last=False)[1]
+            self.bytes -= evicted.get_pitch() * evicted.get_height()
+        return surface
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.surfaces), "bytes": self.bytes}
+
+    def clear(self):
+        self.surfaces.clear()
+        self.bytes = 0
+
+text_cache = TextCache()
+
+class ScoreStore:
+    def __init__(self, path=SCORES_PATH, mirror_path=HIGHSCORE_PATH, size=10):
+        self.path = path
+        self.mirror_path = mirror_path
+        self.size = size
+        self.connection = None
+        self.loaded = False
+        self.best = 0
+        self.leaderboard = []
+        self.by_character = {}
+        self.by_background = {}
+
+    def load(self):
+        if self.loaded:
+            return
+        self.loaded = True
+        self.best = self.read_mirror()
+        rows = []
+        try:
+            self.connection = sqlite3.connect(self.path, isolation_level=None)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS scores (id INTEGER PRIMARY KEY, score INTEGER NOT NULL, "
+                                    "character TEXT, background TEXT, wave INTEGER, time REAL, created REAL)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS scores_by_score ON scores (score DESC)")
+            rows = self.connection.execute("SELECT score, character, background, wave, time, created FROM scores ORDER BY score DESC, id").fetchall()
+        except sqlite3.Error as e:
+            print("Error:", e)
+            self.connection = None
+        for score, character, background, wave, survived, created in rows:
+            self.rank({"score": score, "character": character, "background": background, "wave": wave, "time": survived, "created": created})
+        if not rows and self.best > 0:
+            self.record(self.best, None, None)
+
+    def read_mirror(self):
+        try:
+            with open(self.mirror_path, "r") as highscore_file:
+                return int(highscore_file.readline() or 0)
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError) as e:
+            print("Error:", e)
+            return 0
+
+    def write_mirror(self):
+        temp_path = self.mirror_path + ".tmp"
+        try:
+            with open(temp_path, "w") as highscore_file:
+                highscore_file.write(str(self.best))
+                highscore_file.flush()
+                os.fsync(highscore_file.fileno())
+            os.replace(temp_path, self.mirror_path)
+        except OSError as e:
+            print("Error:", e)
+
+    def insert(self, board, entry):
+        index = len(board)
+        while index and board[index - 1]["score"] < entry["score"]:
+            index -= 1
+        if index < self.size:
+            board.insert(index, entry)
+            del board[self.size:]
+
+    def rank(self, entry):
+        self.insert(self.leaderboard, entry)
+        self.insert(self.by_character.setdefault(entry["character"], []), entry)
+        self.insert(self.by_background.setdefault(entry["background"], []), entry)
+        self.best = max(self.best, entry["score"])
+
+    def record(self, score, character, background, wave=0, survived=0):
+        self.load()
+        entry = {"score": score, "character": character, "background": background, "wave": wave, "time": survived, "created": time.time()}
+        if self.connection is not None:
+            try:
+                self.connection.execute("INSERT INTO scores (score, character, background, wave, time, created) VALUES (?, ?, ?, ?, ?, ?)",
+                                        (score, character, background, wave, survived, entry["created"]))
+            except sqlite3.Error as e:
+                print("Error:", e)
+        previous_best = self.best
+        self.rank(entry)
+        if self.best > previous_best:
+            self.write_mirror()
+        return entry
+
+    def highscore(self):
+        self.load()
+        return self.best
+
+    def top(self, character=None, background=None):
+        self.load()
+        if character is not None:
+            return self.by_character.get(character, [])
+        if background is not None:
+            return self.by_background.get(background, [])
+        return self.leaderboard
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+        self.loaded = False
+
+scores = ScoreStore()
+
+class ReplayRecorder:
+    def __init__(self, path, game, source, snapshot_interval=600):
+        self.file = open(path, "wb")
+        self.game = game
+        self.source = source
+        self.snapshot_interval = snapshot_interval
+        self.last_position = None
+        self.write_header()
+
+    def write_header(self):
+        character = settings.selected_character.encode()
+        background = settings.selected_background.encode()
+        self.file.write(struct.pack("<4sBQdIIB", REPLAY_MAGIC, REPLAY_VERSION, self.game.seed, settings.fixed_dt,
+                                    self.snapshot_interval, settings.stress_enemies, settings.numpy_enemies))
+        self.file.write(struct.pack("<H", len(character)) + character)
+        self.file.write(struct.pack("<H", len(background)) + background)
+
+    def click(self):
+        self.source.click()
+
+    def poll(self, tick):
+        if tick % self.snapshot_interval == 0:
+            self.write_snapshot(tick)
+        position, clicks = self.source.poll(tick)
+        x = max(-32768, min(32767, int(round(position[0]))))
+        y = max(-32768, min(32767, int(round(position[1]))))
+        clicks = min(clicks, 255)
+        if clicks or (x, y) != self.last_position:
+            self.file.write(struct.pack("<cIhhB", b"I", tick, x, y, clicks))
+            self.last_position = (x, y)
+        return (x, y), clicks
+
+    def write_snapshot(self, tick):
+        payload = zlib.compress(json.dumps(self.game.snapshot(), separators=(",", ":")).encode())
+        self.file.write(struct.pack("<cII", b"S", tick, len(payload)) + payload)
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.file.write(struct.pack("<cI", b"E", self.game.tick))
+        self.file.close()
+
+class Replay:
+    def __init__(self, path):
+        with open(path, "rb") as replay_file:
+            data = replay_file.read()
+        header = struct.Struct("<4sBQdIIB")
+        magic, version, self.seed, self.fixed_dt, self.snapshot_interval, self.stress_enemies, numpy_enemies = header.unpack_from(data, 0)
+        if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+            raise ValueError(f"{path} is not a Ghost Jump replay")
+        self.numpy_enemies = bool(numpy_enemies)
+        offset = header.size
+        length = struct.unpack_from("<H", data, offset)[0]
+        self.character = data[offset + 2:offset + 2 + length].decode()
+        offset += 2 + length
+        length = struct.unpack_from("<H", data, offset)[0]
+        self.background = data[offset + 2:offset + 2 + length].decode()
+        offset += 2 + length
+
+        self.inputs = []
+        self.snapshots = []
+        self.end_tick = None
+        while offset < len(data):
+            kind = data[offset:offset + 1]
+            if kind == b"I":
+                _, tick, x, y, clicks = struct.unpack_from("<cIhhB", data, offset)
+                self.inputs.append([tick, x, y, clicks])
+                offset += 10
+            elif kind == b"S":
+                _, tick, length = struct.unpack_from("<cII", data, offset)
+                offset += 9
+                self.snapshots.append((tick, data[offset:offset + length]))
+                offset += length
+            elif kind == b"E":
+                self.end_tick = struct.unpack_from("<cI", data, offset)[1]
+                offset += 5
+            else:
+                raise ValueError(f"Corrupt replay record at byte {offset}")
+        if self.end_tick is None:
+            self.end_tick = self.inputs[-1][0] + 1 if self.inputs else 0
+
+    def create_game(self, screen, headless=False):
+        settings.selected_character = self.character
+        settings.selected_background = self.background
+        settings.fixed_dt = self.fixed_dt
+        settings.stress_enemies = self.stress_enemies
+        settings.numpy_enemies = self.numpy_enemies
+        game = Game(screen, ScriptedInput(self.inputs), headless=headless, run=False, seed=self.seed)
+        game.replaying = True
+        return game
+
+    def snapshot_before(self, tick):
+        nearest = None
+        for snapshot_tick, payload in self.snapshots:
+            if snapshot_tick > tick:
+                break
+            nearest = payload
+        return json.loads(zlib.decompress(nearest)) if nearest is not None else None
+
+    def seek(self, game, tick):
+        state = self.snapshot_before(tick)
+        if state is not None and (tick < game.tick or state["tick"] > game.tick):
+            game.restore(state)
+            game.input.position = tuple(state["player"]["aim"])
+        game.run_until(tick)
+
+REPLAY_MAGIC = b"GJRP"
+REPLAY_VERSION = 1
+
+class DirtyRectRenderer:
+    def __init__(self, screen, max_rects=256):
+        self.screen = screen
+        self.max_rects = max_rects
+        self.size = None
+        self.rects = []
+        self.previous_rects = []
+        self.full_redraw = True
+
+    def invalidate(self):
+        self.full_redraw = True
+
+    def begin(self, background):
+        size = (self.screen.get_size(), display.generation)
+        if size != self.size:
+            self.size = size
+            self.full_redraw = True
+        if self.full_redraw:
+            self.screen.blit(background, (0, 0))
+        else:
+            for rect in self.previous_rects:
+                self.screen.blit(background, rect, rect)
+        self.rects = []
+
+    def mark(self, rects):
+        if rects is None:
+            return
+        if isinstance(rects, pygame.Rect):
+            self.rects.append(rects)
+        else:
+            self.rects.extend(rects)
+
+    def present(self):
+        dirty = self.previous_rects + self.rects
+        if self.full_redraw or len(dirty) > self.max_rects:
+            display.flip()
+            self.full_redraw = False
+        elif dirty:
+            display.update(dirty)
+        self.previous_rects = self.rects
+
+class SpriteAtlas:
+    def __init__(self, surface, entries):
+        self.surface = surface
+        self.entries = entries
+        self.regions = {}
+
+    @classmethod
+    def build(cls, sprites, width=512, padding=1):
+        images = [(path, tuple(size), assets.image(path, size)) for path, size in sprites]
+        x = y = shelf_height = 0
+        entries = []
+        for path, size, surface in sorted(images, key=lambda item: -item[1][1]):
+            if x + size[0] > width:
+                x, y = 0, y + shelf_height + padding
+                shelf_height = 0
+            entries.append((path, size, pygame.Rect((x, y), size), surface))
+            x += size[0] + padding
+            shelf_height = max(shelf_height, size[1])
+        atlas_surface = surfaces.track(pygame.Surface((width, y + shelf_height), pygame.SRCALPHA), "atlas")
+        for _, _, rect, surface in entries:
+            atlas_surface.blit(surface, rect, special_flags=pygame.BLEND_RGBA_ADD)
+        return cls(atlas_surface, [(path, size, rect) for path, size, rect, _ in entries])
+
+    @classmethod
+    def load(cls, path):
+        index_path = os.path.splitext(path)[0] + ".json"
+        if not os.path.exists(path) or not os.path.exists(index_path):
+            return None
+        try:
+            with open(index_path, "r") as index_file:
+                index = json.load(index_file)
+            entries = []
+            for entry in index:
+                stat = os.stat(entry["path"])
+                if stat.st_size != entry["source_size"] or int(stat.st_mtime) != entry["source_mtime"]:
+                    return None
+                entries.append((entry["path"], tuple(entry["size"]), pygame.Rect(entry["rect"])))
+            return cls(surfaces.track(assets.convert(pygame.image.load(path)), "atlas"), entries)
+        except (OSError, ValueError, KeyError, pygame.error) as e:
+            print("Error:", e)
+            return None
+
+    def save(self, path):
+        pygame.image.save(self.surface, path)
+        index = []
+        for source, size, rect in self.entries:
+            stat = os.stat(source)
+            index.append({
+                "path": source,
+                "size": list(size),
+                "rect": list(rect),
+                "source_size": stat.st_size,
+                "source_mtime": int(stat.st_mtime)
+            })
+        with open(os.path.splitext(path)[0] + ".json", "w") as index_file:
+            json.dump(index, index_file, indent=1)
+
+    def install(self, manager):
+        for path, size, rect in self.entries:
+            sprite = self.surface.subsurface(rect)
+            manager.images[(path, size, True)] = sprite
+            self.regions[sprite] = rect
+        manager.animations.clear()
+
+class SpriteBatch:
+    def __init__(self, atlas=None):
+        self.atlas = atlas
+        self.sequence = []
+
+    def clear(self):
+        self.sequence = []
+
+    def blit(self, surface, dest, area=None):
+        region = self.atlas.regions.get(surface) if self.atlas is not None and area is None else None
+        if region is not None:
+            self.sequence.append((self.atlas.surface, dest, region))
+            return pygame.Rect(dest, region.size)
+        self.sequence.append((surface, dest, area))
+        return pygame.Rect(dest, area.size if area else surface.get_size())
+
+    def blits(self, blit_sequence):
+        return [self.blit(*item) for item in blit_sequence]
+
+    def circle(self, color, center, radius):
+        radius = int(radius)
+        if radius <= 0:
+            return pygame.Rect(center, (0, 0))
+        return self.blit(assets.circle(color, radius), (center[0] - radius, center[1] - radius))
+
+    def flush(self, screen):
+        rects = screen.blits(self.sequence)
+        self.sequence = []
+        return rects
+
+def draw_circle(target, color, center, radius):
+    if isinstance(target, SpriteBatch):
+        return target.circle(color, center, radius)
+    return pygame.draw.circle(target, color, center, radius)
+
+class AtlasSprite(pygame.sprite.DirtySprite):
+    def __init__(self, atlas, surface=None, layer=0):
+        super().__init__()
+        self.atlas = atlas
+        self._layer = layer
+        self.dirty = 2
+        self.source = None
+        self.rect = pygame.Rect(0, 0, 0, 0)
+        if surface is not None:
+            self.set_surface(surface)
+
+    def set_surface(self, surface):
+        if surface is self.source:
+            return
+        self.source = surface
+        region = self.atlas.regions.get(surface) if self.atlas is not None else None
+        if region is not None:
+            self.image = self.atlas.surface
+            self.source_rect = region
+        else:
+            self.image = surface
+            self.source_rect = None
+        self.rect.size = surface.get_size()
+
+class FrameProfiler:
+    def __init__(self, window=300, max_events=200000):
+        self.enabled = False
+        self.enable_next_frame = False
+        self.show_overlay = False
+        self.window = window
+        self.max_events = max_events
+        self.samples = {}
+        self.frame_times = {}
+        self.events = []
+        self.frame = 0
+        self.frame_start = 0
+        self.origin = time.perf_counter()
+        self.overlay = None
+        self.overlay_frame = -1
+
+    def reset(self):
+        self.samples.clear()
+        self.frame_times.clear()
+        self.events = []
+        self.frame = 0
+        self.overlay = None
+        self.origin = time.perf_counter()
+
+    def start(self):
+        if not self.enabled:
+            return 0
+        return time.perf_counter()
+
+    def stop(self, name, start):
+        if not self.enabled or not start:
+            return
+        now = time.perf_counter()
+        self.frame_times[name] = self.frame_times.get(name, 0) + (now - start)
+        if len(self.events) < self.max_events:
+            self.events.append((name, start, now - start, self.frame))
+
+    def begin_frame(self):
+        if self.enable_next_frame:
+            self.enabled = True
+            self.enable_next_frame = False
+        self.frame_start = self.start()
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+        self.stop("frame", self.frame_start)
+        for name, duration in self.frame_times.items():
+            samples = self.samples.get(name)
+            if samples is None:
+                samples = self.samples[name] = deque(maxlen=self.window)
+            samples.append(duration * 1000)
+        self.frame_times.clear()
+        self.frame += 1
+
+    def toggle_overlay(self):
+        self.show_overlay = not self.show_overlay
+        if self.show_overlay and not self.enabled:
+            self.enable_next_frame = True
+
+    def percentiles(self, name):
+        samples = sorted(self.samples.get(name, ()))
+        if not samples:
+            return 0, 0, 0
+        last = len(samples) - 1
+        return tuple(samples[min(last, int(last * p))] for p in (0.5, 0.95, 0.99))
+
+    def summary(self):
+        result = {}
+        for name in self.samples:
+            p50, p95, p99 = self.percentiles(name)
+            result[name] = {"p50": round(p50, 4), "p95": round(p95, 4), "p99": round(p99, 4)}
+        return result
+
+    def draw_overlay(self, screen):
+        if not self.show_overlay:
+            return None
+        if self.overlay is None or self.frame - self.overlay_frame >= 15:
+            self.overlay_frame = self.frame
+            lines = ["phase              p50     p95     p99 (ms)"]
+            for name in self.samples:
+                p50, p95, p99 = self.percentiles(name)
+                lines.append(f"{name:<16}{p50:>7.2f} {p95:>7.2f} {p99:>7.2f}")
+            font = assets.font("data/fonts/Montserrat-ExtraBold.ttf", 12)
+            line_height = font.get_linesize()
+            width = max(font.size(line)[0] for line in lines) + 16
+            self.overlay = surfaces.track(pygame.Surface((width, line_height * len(lines) + 12), pygame.SRCALPHA), "overlay")
+            self.overlay.fill((0, 0, 0, 170))
+            for i, line in enumerate(lines):
+                self.overlay.blit(font.render(line, True, (230, 230, 230)), (8, 6 + i * line_height))
+        return screen.blit(self.overlay, (10, 50))
+
+    def export(self, path):
+        try:
+            if path.endswith(".csv"):
+                with open(path, "w") as trace_file:
+                    trace_file.write("frame,phase,start_ms,duration_ms\n")
+                    for name, start, duration, frame in self.events:
+                        trace_file.write(f"{frame},{name},{(start - self.origin) * 1000:.4f},{duration * 1000:.4f}\n")
+            else:
+                trace = {"traceEvents": [
+                    {"name": name, "ph": "X", "pid": 1, "tid": 1, "ts": round((start - self.origin) * 1000000, 1), "dur": round(duration * 1000000, 1), "args": {"frame": frame}}
+                    for name, start, duration, frame in self.events
+                ]}
+                with open(path, "w") as trace_file:
+                    json.dump(trace, trace_file)
+            print(f"Profile written to {path}")
+        except Exception as e:
+            print("Error:", e)
+
+profiler = FrameProfiler()
+
+class AudioEngine:
+    def __init__(self, categories=SOUND_CATEGORIES):
+        self.categories = categories
+        self.channels = []
+        self.voices = {}
+        self.plays = 0
+        self.steals = 0
+        self.drops = 0
+        self.music_path = None
+        self.failed_music = set()
+        self.ready = False
+
+    def init(self):
+        if self.ready:
+            return True
+        if settings.headless or not init_mixer():
+            return False
+        count = sum(voices for voices, _ in self.categories.values())
+        mixer.set_num_channels(max(mixer.get_num_channels(), count))
+        mixer.set_reserved(count)
+        self.channels = [mixer.Channel(index) for index in range(count)]
+        self.ready = True
+        return True
+
+    def acquire(self, category):
+        limit, priority = self.categories[category]
+        playing = {channel: voice for channel, voice in self.voices.items() if channel.get_busy()}
+        self.voices = playing
+        own = [channel for channel, voice in playing.items() if voice[0] == category]
+        if len(own) >= limit:
+            self.steals += 1
+            return min(own, key=lambda channel: playing[channel][2])
+        for channel in self.channels:
+            if channel not in playing:
+                return channel
+        candidates = [channel for channel, voice in playing.items() if voice[1] <= priority]
+        if not candidates:
+            self.drops += 1
+            return None
+        self.steals += 1
+        return min(candidates, key=lambda channel: (playing[channel][1], playing[channel][2]))
+
+    def play(self, path, volume, category="ui"):
+        if not self.init():
+            return None
+        channel = self.acquire(category)
+        if channel is None:
+            return None
+        self.plays += 1
+        channel.set_volume(volume)
+        channel.play(assets.sound(path))
+        self.voices[channel] = (category, self.categories[category][1], self.plays)
+        return channel
+
+    def play_music(self, path, volume, loops=-1):
+        if path in self.failed_music or not self.init():
+            return False
+        if path == self.music_path and mixer.music.get_busy():
+            mixer.music.set_volume(volume)
+            return True
+        try:
+            mixer.music.load(path)
+            mixer.music.set_volume(volume)
+            mixer.music.play(loops)
+        except pygame.error as e:
+            print("Error:", e)
+            self.failed_music.add(path)
+            self.music_path = None
+            return False
+        self.music_path = path
+        return True
+
+    def set_music_volume(self, volume):
+        if self.ready:
+            mixer.music.set_volume(volume)
+
+    def stop_music(self):
+        if self.ready:
+            mixer.music.stop()
+        self.music_path = None
+
+    def stats(self):
+        return {"plays": self.plays, "steals": self.steals, "drops": self.drops, "voices": len(self.voices)}
+
+audio = AudioEngine()
+
+class SpatialHash:
+    def __init__(self, cell_size=100):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.entries = {}
+
+    def cell_keys(self, rect):
+        cell_size = self.cell_size
+        return tuple((x, y)
+                     for x in range(rect.left // cell_size, (rect.right - 1) // cell_size + 1)
+                     for y in range(rect.top // cell_size, (rect.bottom - 1) // cell_size + 1))
+
+    def insert(self, item):
+        keys = self.cell_keys(item.get_bounds())
+        self.entries[item] = keys
+        for key in keys:
+            self.cells.setdefault(key, {})[item] = None
+
+    def remove(self, item):
+        keys = self.entries.pop(item, None)
+        if keys is None:
+            return
+        for key in keys:
+            cell = self.cells[key]
+            del cell[item]
+            if not cell:
+                del self.cells[key]
+
+    def move(self, item):
+        keys = self.cell_keys(item.get_bounds())
+        if self.entries.get(item) != keys:
+            self.remove(item)
+            self.entries[item] = keys
+            for key in keys:
+                self.cells.setdefault(key, {})[item] = None
+
+    def query(self, rect):
+        found = {}
+        for key in self.cell_keys(rect):
+            cell = self.cells.get(key)
+            if cell:
+                found.update(cell)
+        return list(found)
+
+    def __contains__(self, item):
+        return item in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        self.cells.clear()
+        self.entries.clear()
+
 class GameObject(ABC):
+    __slots__ = ("_position", "previous_position")
+
     def __init__(self, position):
         self._position = position
+        self.previous_position = Vector2(position)
+
+    def save_position(self):
+        self.previous_position.update(self._position)
+
+    def render_position(self):
+        if not settings.interpolate or self.previous_position is None:
+            return self._position
+        if self.previous_position.distance_squared_to(self._position) > 10000:
+            return self._position
+        return self.previous_position.lerp(self._position, settings.alpha)
 
     @abstractmethod
     def draw(self, screen):
@@ -53,28 +1369,36 @@ class GameObject(ABC):
         self._position = value
 
 class GameCharacter(GameObject):
-    def __init__(self, position, sprite):
+    def __init__(self, position, animation):
         super().__init__(position)
-        self._sprite = sprite
+        self.animation = animation
+        self._sprite = animation.frame()
 
     def draw(self, screen):
-        screen.blit(self._sprite, (self._position.x, self._position.y))
+        screen.blit(self.animation.frame(settings.sim_time), (self._position.x, self._position.y))
 
 class Player(GameCharacter):
-    def __init__(self, position, sprite):
-        super().__init__(position, sprite)
+    def __init__(self, position, animation):
+        super().__init__(position, animation)
         self.is_dead = False
         self._score = 0
         self.velocity = Vector2()
         self.rotation = Vector2()
         self.offset = Vector2()
         self.gun = Gun()
-        self.drag = 100
-        self.gravity_scale = 300
+        self.drag = settings.player_drag
+        self.gravity_scale = settings.player_gravity
         self.shield_sprite = None
+        self.shield_animation = assets.animation('data/images/shield.png', (90, 120), alpha_steps=settings.shield_fade_steps)
         self.shield_sprite_duration = 3
         self.shield_sprite_timer = 0
         self.shield_alpha = 255
+        self.aim = Vector2()
+        self.force_direction = Vector2()
+        self.bounds = pygame.Rect(0, 0, *animation.size)
+        self.world_size = (800, 800)
+        self.time = 0
+        self.ignore_enemy_collision_until = 0
 
     @property
     def score(self):
@@ -91,11 +1415,11 @@ class Player(GameCharacter):
         self.position.x -= self.velocity.x * settings.dt
         self.position.y -= self.velocity.y * settings.dt
         self.update_shield_sprite()
+        self.time += settings.dt
 
     def handle_gun(self):
-        self.gun.set_position(self.position)
-        mouse_x, mouse_y = pygame.mouse.get_pos()
-        rel_x, rel_y = mouse_x - self.position.x, mouse_y - self.position.y
+        self.gun.set_position(self.position, self.previous_position)
+        rel_x, rel_y = self.aim.x - self.position.x, self.aim.y - self.position.y
         angle = (180 / math.pi) * -math.atan2(rel_y, rel_x)
         self.gun.set_rotation(angle)
 
@@ -118,7 +1442,6 @@ class Player(GameCharacter):
     def update_shield_alpha(self):
         remaining_time_percentage = self.shield_sprite_timer / self.shield_sprite_duration
         self.shield_alpha = int(255 * remaining_time_percentage)
-        self.shield_sprite.set_alpha(self.shield_alpha)
 
     def gravity(self):
         self.velocity.y -= self.gravity_scale * settings.dt
@@ -128,7 +1451,7 @@ class Player(GameCharacter):
         self.velocity.x -= (self.drag - 50) * settings.dt if self.velocity.x > 0 else (self.drag - 50) * settings.dt if self.velocity.x < 0 else 0
 
     def wall_detection(self):
-        screen_width, screen_height = screen.get_size()
+        screen_width, screen_height = self.world_size
         if self.position.x < 0:
             self.position.x = screen_width
         if self.position.x > screen_width:
@@ -136,32 +1459,22 @@ class Player(GameCharacter):
 
     def check_state(self):
         if self.is_dead:
-            try:
-                with open("data/serialisation/highscore.txt", "r") as highscore_file:
-                    old_highscore_value = highscore_file.readline()
-                if self.score > int(old_highscore_value):
-                    with open("data/serialisation/highscore.txt", "w") as highscore_value:
-                        highscore_value.write(str(self.score))
-            except FileNotFoundError:
-                print("Error: Highscore file not found.")
-            except Exception as e:
-                print("Error:", e)
-
             settings.is_menu = True
             settings.is_character_selection = True
             settings.selected_character = None
 
     def collision_detection(self, level_builder):
-        for collectible in level_builder.collectibles:
-            if self.get_bounds().colliderect(collectible.get_bounds()):
+        bounds = self.get_bounds()
+        for collectible in level_builder.spatial_hash.query(bounds):
+            if collectible not in level_builder.spatial_hash:
+                continue
+            if bounds.colliderect(collectible.get_bounds()):
                 if collectible.collectible_type == "soul":
                     self.gun.soul_count += 1
-                    level_builder.collectibles.remove(collectible)
                     level_builder.repopulate_collectible("soul")
                     self.score += 1
                 elif collectible.collectible_type == "baby":
                     self.gun.soul_count += 3
-                    level_builder.collectibles.remove(collectible)
                     level_builder.repopulate_collectible("baby")
                     self.score += 3
                 elif collectible.collectible_type == "enemy":
@@ -170,120 +1483,380 @@ class Player(GameCharacter):
                 elif collectible.collectible_type == "shield":
                     self.ignore_enemy_collision(3)
                     self.show_shield_sprite()
-                    level_builder.collectibles.remove(collectible)
                     level_builder.repopulate_collectible("shield")
 
-        if self.position.y > screen.get_height():
+        if level_builder.enemies is not None and level_builder.enemies.collide(bounds):
+            if not self.ignore_enemy_collision():
+                self.is_dead = True
+
+        if self.position.y > self.world_size[1]:
             self.is_dead = True
 
     def show_shield_sprite(self):
-        sound = mixer.Sound("data/audio/Shield.mp3")
-        sound.set_volume(0.5)
-        sound.play()
-        self.shield_sprite = pygame.image.load('data/images/shield.png').convert_alpha()
-        self.shield_sprite = pygame.transform.scale(self.shield_sprite, (90, 120))
+        audio.play("data/audio/Shield.mp3", 0.5, "pickup")
+        self.shield_sprite = self.shield_animation
         self.shield_sprite_timer = self.shield_sprite_duration
         self.shield_alpha = 255
 
     def ignore_enemy_collision(self, duration=None):
         if duration is not None:
-            self.ignore_enemy_collision_until = time.time() + duration
-        return time.time() < getattr(self, 'ignore_enemy_collision_until', 0)
+            self.ignore_enemy_collision_until = self.time + duration
+        return self.time < self.ignore_enemy_collision_until
 
     def get_bounds(self):
-        return pygame.Rect(self.position.x - (self._sprite.get_width() // 2),
-                           self.position.y - (self._sprite.get_height() // 2),
-                           self._sprite.get_width(),
-                           self._sprite.get_height())
+        bounds = self.bounds
+        bounds.x = int(self.position.x - (bounds.width // 2))
+        bounds.y = int(self.position.y - (bounds.height // 2))
+        return bounds
 
     def draw(self, screen):
-        self.gun.draw(screen)
-        screen.blit(self._sprite, self.blit_position())
+        position = self.render_position()
+        rects = self.gun.draw(screen)
+        rects.append(screen.blit(self.animation.frame(self.time), self.blit_position(position)))
         if self.shield_sprite:
-            self.shield_sprite.set_alpha(self.shield_alpha)
-            screen.blit(self.shield_sprite, (self.position.x - self.shield_sprite.get_width() // 2, self.position.y - self.shield_sprite.get_height() // 2))
-        pygame.draw.circle(screen, (170, 10, 10), (self.position.x  - 5 + self.offset.x, self.position.y - 7 + self.offset.y), 3)
-        pygame.draw.circle(screen, (170, 10, 10), (self.position.x  + 10 + self.offset.x , self.position.y - 7 + self.offset.y ), 3)
+            shield = self.shield_sprite.frame(self.time, self.shield_alpha / 255)
+            rects.append(screen.blit(shield, (position.x - shield.get_width() // 2, position.y - shield.get_height() // 2)))
+        rects.append(draw_circle(screen, (170, 10, 10), (position.x  - 5 + self.offset.x, position.y - 7 + self.offset.y), 3))
+        rects.append(draw_circle(screen, (170, 10, 10), (position.x  + 10 + self.offset.x , position.y - 7 + self.offset.y ), 3))
+        return rects
 
-    def blit_position(self):
-        return (self.position.x - (self._sprite.get_width() // 2), self.position.y - (self._sprite.get_height() // 2))
+    def blit_position(self, position=None):
+        if position is None:
+            position = self.position
+        return (position.x - (self._sprite.get_width() // 2), position.y - (self._sprite.get_height() // 2))
 
     def shoot(self):
         if self.gun.soul_count <= 0:
             return
-        mouse_x, mouse_y = pygame.mouse.get_pos()
-        rel_x, rel_y = mouse_x - self.position.x, mouse_y - self.position.y
-        vector = Vector2()
+        rel_x, rel_y = self.aim.x - self.position.x, self.aim.y - self.position.y
+        vector = self.force_direction
         vector.xy = rel_x, rel_y
         mag = vector.magnitude()
+        if mag == 0:
+            return
         vector.xy /= mag
         self.velocity.y = 0
         self.velocity.x = 0
-        self.add_force(vector, 500)
+        self.add_force(vector, settings.shot_force)
 
     def add_force(self, vector, magnitude):
         self.velocity.x += vector.x * magnitude
         self.velocity.y += vector.y * magnitude
 
+class ObjectPool:
+    def __init__(self, factory):
+        self.factory = factory
+        self.free = []
+        self.created = 0
+        self.reused = 0
+
+    def acquire(self, *args):
+        if self.free:
+            item = self.free.pop()
+            self.reused += 1
+        else:
+            item = self.factory()
+            self.created += 1
+        item.reset(*args)
+        return item
+
+    def release(self, item):
+        self.free.append(item)
+
+    def release_all(self, items):
+        self.free.extend(items)
+
+    def stats(self):
+        return {"created": self.created, "reused": self.reused, "free": len(self.free)}
+
 class Explosion(GameObject):
+    __slots__ = ("width",)
+
     def __init__(self, position):
-        super().__init__(position)
+        super().__init__(Vector2(position))
+        self.width = 20
+
+    def reset(self, position):
+        self.position.update(position)
+        self.previous_position.update(position)
         self.width = 20
 
     def draw(self, screen):
-        pygame.draw.circle(screen, (220, 0, 0), self.position, self.width)
-        pygame.draw.circle(screen, (255, 153, 51), self.position, self.width - (self.width // 2))
+        rect = draw_circle(screen, (220, 0, 0), self.position, self.width)
+        draw_circle(screen, (255, 153, 51), self.position, self.width - (self.width // 2))
+        return rect
     
     def scale_down(self):
         if self.width > 0:
             self.width -= settings.dt * 50
 
+explosion_pool = ObjectPool(lambda: Explosion((0, 0)))
+
 class Collectible(GameObject):
-    def __init__(self, position, collectible_type):
-        super().__init__(position)
+    __slots__ = ("collectible_type", "animation", "gravity_scale", "variant", "bounds")
+
+    def __init__(self, position, collectible_type, rng=random):
+        super().__init__(Vector2(position))
+        self.bounds = pygame.Rect(0, 0, 0, 0)
+        self.reset(position, collectible_type, rng)
+
+    def reset(self, position, collectible_type, rng=random):
+        self.position.update(position)
+        self.previous_position.update(position)
         self.collectible_type = collectible_type
-        self.load_sprite()
+        self.gravity_scale = 0
+        self.variant = 0
+        self.load_sprite(rng)
+        self.bounds.update(int(self.position.x), int(self.position.y), *self.animation.size)
+
+    @property
+    def sprite(self):
+        return self.animation.frame(settings.sim_time)
 
-    def load_sprite(self):
+    def load_sprite(self, rng=random):
         if self.collectible_type == "soul":
-            self.sprite = pygame.image.load('data/images/Soul.png')
-            self.sprite = pygame.transform.scale(self.sprite, (30, 40))
+            self.animation = assets.animation('data/images/Soul.png', (30, 40))
         elif self.collectible_type == "baby":
-            self.sprite = pygame.image.load('data/images/Baby.png')
-            self.sprite = pygame.transform.scale(self.sprite, (70, 80))
+            self.animation = assets.animation('data/images/Baby.png', (70, 80))
         elif self.collectible_type == "shield":
-            self.sprite = pygame.image.load('data/images/shield.png')
-            self.sprite = pygame.transform.scale(self.sprite, (40, 50))
+            self.animation = assets.animation('data/images/shield.png', (40, 50))
         elif self.collectible_type == "enemy":
-            rand = random.randint(0, 1)
-            if rand == 0:
-                self.sprite = pygame.image.load('data/images/Nail.png')
-            else:
-                self.sprite = pygame.image.load('data/images/Fish.png')
-            self.sprite = pygame.transform.scale(self.sprite, (30, 50))
-            self.gravity_scale = random.randint(20, 40)
+            self.set_variant(rng.randint(0, 1))
+            self.gravity_scale = rng.randint(*settings.enemy_speed)
+
+    def set_variant(self, variant):
+        self.variant = variant
+        if variant == 0:
+            self.animation = assets.animation('data/images/Nail.png', (30, 50))
+        else:
+            self.animation = assets.animation('data/images/Fish.png', (30, 50))
 
     def draw(self, screen):
-        screen.blit(self.sprite, self.position)
+        return screen.blit(self.sprite, self.render_position())
+
+    def update(self):
         if self.collectible_type == "enemy":
             self.apply_gravity()
 
     def apply_gravity(self):
         self.position.y += self.gravity_scale * settings.dt
+        self.bounds.y = int(self.position.y)
 
     def get_bounds(self):
-        return pygame.Rect(self.position.x, self.position.y, self.sprite.get_width(), self.sprite.get_height())
+        return self.bounds
+
+collectible_pool = ObjectPool(lambda: Collectible((0, 0), "soul"))
+
+def cache_stats():
+    return {
+        "assets": assets.stats(),
+        "text": text_cache.stats(),
+        "explosion_pool": explosion_pool.stats(),
+        "collectible_pool": collectible_pool.stats(),
+        "audio": audio.stats()
+    }
+
+class EnemySwarm:
+    def __init__(self, capacity=256):
+        self.animations = [
+            assets.animation('data/images/Nail.png', (30, 50)),
+            assets.animation('data/images/Fish.png', (30, 50))
+        ]
+        self.width, self.height = 30, 50
+        self.count = 0
+        self.positions = numpy.zeros((capacity, 2), dtype=numpy.float32)
+        self.previous_positions = numpy.zeros((capacity, 2), dtype=numpy.float32)
+        self.velocities = numpy.zeros((capacity, 2), dtype=numpy.float32)
+        self.sprite_indices = numpy.zeros(capacity, dtype=numpy.int8)
+
+    def reserve(self, capacity):
+        if capacity <= len(self.positions):
+            return
+        capacity = max(capacity, len(self.positions) * 2)
+        for name in ("positions", "previous_positions", "velocities", "sprite_indices"):
+            old = getattr(self, name)
+            new = numpy.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def spawn(self, xs, y, speeds, sprite_indices):
+        count = len(xs)
+        self.reserve(self.count + count)
+        end = self.count + count
+        self.positions[self.count:end, 0] = xs
+        self.positions[self.count:end, 1] = y
+        self.previous_positions[self.count:end] = self.positions[self.count:end]
+        self.velocities[self.count:end, 0] = 0
+        self.velocities[self.count:end, 1] = speeds
+        self.sprite_indices[self.count:end] = sprite_indices
+        self.count = end
+
+    def save_positions(self):
+        self.previous_positions[:self.count] = self.positions[:self.count]
+
+    def update(self, dt):
+        self.positions[:self.count] += self.velocities[:self.count] * dt
+
+    def cull(self, max_y):
+        count = self.count
+        keep = self.positions[:count, 1] <= max_y
+        kept = int(numpy.count_nonzero(keep))
+        if kept == count:
+            return []
+        culled = ~keep
+        culled = list(zip(self.positions[:count, 0][culled].tolist(), self.sprite_indices[:count][culled].tolist()))
+        for array in (self.positions, self.previous_positions, self.velocities, self.sprite_indices):
+            array[:kept] = array[:count][keep]
+        self.count = kept
+        return culled
+
+    def collide(self, rect):
+        if not self.count:
+            return False
+        x = self.positions[:self.count, 0]
+        y = self.positions[:self.count, 1]
+        hits = (x < rect.right) & (x + self.width > rect.left) & (y < rect.bottom) & (y + self.height > rect.top)
+        return bool(hits.any())
+
+    def draw(self, screen):
+        if not self.count:
+            return []
+        positions = self.positions[:self.count]
+        if settings.interpolate:
+            previous = self.previous_positions[:self.count]
+            positions = previous + (positions - previous) * settings.alpha
+        sprites = [animation.frame(settings.sim_time) for animation in self.animations]
+        return screen.blits([(sprites[index], (x, y)) for index, (x, y) in zip(self.sprite_indices[:self.count].tolist(), positions.tolist())])
+
+class ParticleSystem:
+    EXPLOSION_OUTER = (220, 0, 0, 255)
+    EXPLOSION_INNER = (255, 153, 51, 255)
+    SMOKE = (150, 150, 150, 110)
+    DEBRIS = [(160, 160, 170, 255), (90, 120, 160, 255)]
+
+    def __init__(self, capacity=4096, seed=None):
+        self.count = 0
+        self.palette = []
+        self.palette_index = {}
+        self.sprites = []
+        self.rng = numpy.random.default_rng(seed)
+        self.positions = numpy.zeros((capacity, 2), dtype=numpy.float32)
+        self.previous_positions = numpy.zeros((capacity, 2), dtype=numpy.float32)
+        self.velocities = numpy.zeros((capacity, 2), dtype=numpy.float32)
+        self.gravity = numpy.zeros(capacity, dtype=numpy.float32)
+        self.radii = numpy.zeros(capacity, dtype=numpy.float32)
+        self.growth = numpy.zeros(capacity, dtype=numpy.float32)
+        self.life = numpy.zeros(capacity, dtype=numpy.float32)
+        self.colors = numpy.zeros(capacity, dtype=numpy.int16)
+
+    def color(self, rgba):
+        index = self.palette_index.get(rgba)
+        if index is None:
+            index = len(self.palette)
+            self.palette.append(rgba)
+            self.palette_index[rgba] = index
+            self.sprites.append({})
+        return index
+
+    def reserve(self, capacity):
+        if capacity <= len(self.positions):
+            return
+        capacity = max(capacity, len(self.positions) * 2)
+        for name in ("positions", "previous_positions", "velocities", "gravity", "radii", "growth", "life", "colors"):
+            old = getattr(self, name)
+            new = numpy.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def emit(self, positions, velocities, radii, growth, life, color, gravity=0):
+        count = len(positions)
+        self.reserve(self.count + count)
+        start, end = self.count, self.count + count
+        self.positions[start:end] = positions
+        self.previous_positions[start:end] = positions
+        self.velocities[start:end] = velocities
+        self.radii[start:end] = radii
+        self.growth[start:end] = growth
+        self.life[start:end] = life
+        self.gravity[start:end] = gravity
+        self.colors[start:end] = self.color(color)
+        self.count = end
+
+    def explosion(self, position, width=20, shrink=50):
+        life = (width - 1) / shrink
+        self.emit([position], [(0, 0)], width, -shrink, life, self.EXPLOSION_OUTER)
+        self.emit([position], [(0, 0)], width - width // 2, -(shrink / 2), life, self.EXPLOSION_INNER)
+
+    def smoke(self, position, direction, count=6):
+        rng = self.rng
+        angles = math.atan2(direction[1], direction[0]) + rng.uniform(-0.5, 0.5, count)
+        speeds = rng.uniform(30, 90, count)
+        velocities = numpy.stack((numpy.cos(angles) * speeds, numpy.sin(angles) * speeds), axis=1)
+        self.emit(numpy.tile(position, (count, 1)), velocities, rng.uniform(3, 6, count), 12, rng.uniform(0.4, 0.8, count), self.SMOKE, -20)
+
+    def debris(self, position, variant=0, count=10):
+        rng = self.rng
+        velocities = numpy.stack((rng.uniform(-120, 120, count), rng.uniform(-260, -80, count)), axis=1)
+        self.emit(numpy.tile(position, (count, 1)), velocities, rng.uniform(2, 4, count), -1.5, rng.uniform(0.6, 1.0, count), self.DEBRIS[variant], 500)
+
+    def save_positions(self):
+        self.previous_positions[:self.count] = self.positions[:self.count]
+
+    def update(self, dt):
+        count = self.count
+        if not count:
+            return
+        self.velocities[:count, 1] += self.gravity[:count] * dt
+        self.positions[:count] += self.velocities[:count] * dt
+        self.radii[:count] += self.growth[:count] * dt
+        self.life[:count] -= dt
+        alive = (self.life[:count] > 0) & (self.radii[:count] >= 1)
+        kept = int(numpy.count_nonzero(alive))
+        if kept == count:
+            return
+        for array in (self.positions, self.previous_positions, self.velocities, self.gravity, self.radii, self.growth, self.life, self.colors):
+            array[:kept] = array[:count][alive]
+        self.count = kept
+
+    def clear(self):
+        self.count = 0
+
+    def sprite(self, color, radius):
+        sprites = self.sprites[color]
+        sprite = sprites.get(radius)
+        if sprite is None:
+            sprite = assets.circle(self.palette[color], radius)
+            sprites[radius] = sprite
+        return sprite
+
+    def draw(self, screen):
+        count = self.count
+        if not count:
+            return []
+        positions = self.positions[:count]
+        if settings.interpolate:
+            previous = self.previous_positions[:count]
+            positions = previous + (positions - previous) * settings.alpha
+        radii = self.radii[:count].astype(numpy.int32)
+        corners = positions - radii[:, None]
+        sprite = self.sprite
+        return screen.blits([(sprite(color, radius), corner) for color, radius, corner in zip(self.colors[:count].tolist(), radii.tolist(), corners.tolist())])
 
 class Gun(GameObject):
     def __init__(self):
         self.gun_sprite = None
         self.position = Vector2()
+        self.previous_position = None
         self.is_flipped = False
         self._soul_count = 3
-        pygame.font.init()
-        self.font = pygame.font.Font("data/fonts/Montserrat-ExtraBold.ttf", 300)
+        self.sprite_offset = (0, 0)
+        self.angle = 0
+        self.rotations = assets.rotations('data/images/Gun.png', (200, 200), settings.gun_rotation_step)
+        if settings.prebuild_rotations:
+            self.rotations.build()
         self.refresh_sprite()
         self.explosions = []
+        self.particles = None
 
     @property
     def soul_count(self):
@@ -294,88 +1867,117 @@ class Gun(GameObject):
         self._soul_count = value
 
     def render_current_ammo(self, screen):
-        text = self.font.render(str(self.soul_count), False, (0, 0, 0))
+        text = text_cache.render("data/fonts/Montserrat-ExtraBold.ttf", 300, str(self.soul_count), False, (0, 0, 0))
         text_rect = text.get_rect(center=(screen.get_width() // 2, screen.get_height() // 2))
-        screen.blit(text, text_rect)
+        outline_rect = screen.blit(text, text_rect)
         outline_color = (0, 0, 0)
 
-        text = self.font.render(str(self.soul_count), False, (150, 150, 150))
+        text = text_cache.render("data/fonts/Montserrat-ExtraBold.ttf", 300, str(self.soul_count), False, (150, 150, 150))
         text_rect = text.get_rect(center=(screen.get_width() // 2, screen.get_height() // 2.08))
-        screen.blit(text, text_rect)
         outline_color = (0, 0, 0)
+        return outline_rect.union(screen.blit(text, text_rect))
 
-    def shoot(self):
+    def shoot(self, aim):
         if self._soul_count > 0:
-            sound = mixer.Sound("data/audio/Gunshot.wav")
-            sound.set_volume(0.1)
-            sound.play()
-            exp_pos = Vector2(self.position)
-            mouse_x, mouse_y = pygame.mouse.get_pos()
-            rel_x, rel_y = mouse_x - self.position.x, mouse_y - self.position.y
-            mag = Vector2(rel_x, rel_y).magnitude()
-            exp_pos.x += (rel_x / mag) * 100
-            exp_pos.y += (rel_y / mag) * 100
-            explosion = Explosion(exp_pos)
-            self.explosions.append(explosion)
+            audio.play("data/audio/Gunshot.wav", 0.1, "gun")
+            exp_x, exp_y = self.position.x, self.position.y
+            rel_x, rel_y = aim.x - exp_x, aim.y - exp_y
+            mag = math.hypot(rel_x, rel_y)
+            if mag > 0:
+                exp_x += (rel_x / mag) * 100
+                exp_y += (rel_y / mag) * 100
+            if self.particles is not None:
+                self.particles.explosion((exp_x, exp_y))
+                self.particles.smoke((exp_x, exp_y), (rel_x, rel_y))
+            else:
+                explosion = explosion_pool.acquire((exp_x, exp_y))
+                self.explosions.append(explosion)
             self._soul_count -= 1
         else:
-            sound = mixer.Sound("data/audio/CantShoot.wav")
-            sound.set_volume(0.08)
-            sound.play()
+            audio.play("data/audio/CantShoot.wav", 0.08, "gun")
 
-    def explode(self, screen):
+    def update(self):
+        remaining = []
         for explosion in self.explosions:
-            if explosion.width <= 1:
-                self.explosions.remove(explosion)
-                break
             explosion.scale_down()
-            explosion.draw(screen)
+            if explosion.width > 1:
+                remaining.append(explosion)
+            else:
+                explosion_pool.release(explosion)
+        self.explosions = remaining
+
+    def explode(self, screen):
+        if self.particles is not None:
+            return self.particles.draw(screen)
+        return [explosion.draw(screen) for explosion in self.explosions]
 
     def refresh_sprite(self):
-        self.gun_sprite = pygame.image.load('data/images/Gun.png')
-        self.gun_sprite = pygame.transform.scale(self.gun_sprite, (200, 200))
+        self.gun_sprite = assets.image('data/images/Gun.png', (200, 200))
+        self.sprite_offset = (self.gun_sprite.get_width() // 2, self.gun_sprite.get_height() // 2)
 
     def draw(self, screen):
-        screen.blit(self.gun_sprite, self.blit_position())
-        self.explode(screen)
+        self.apply_rotation()
+        rects = [screen.blit(self.gun_sprite, self.blit_position())]
+        rects.extend(self.explode(screen))
+        return rects
 
-    def set_position(self, position):
+    def set_position(self, position, previous_position=None):
         self.position = position
+        self.previous_position = previous_position
     
     def set_rotation(self, degrees):
-        self.refresh_sprite()
-        self.gun_sprite = pygame.transform.rotate(self.gun_sprite, degrees)
-          
+        self.angle = degrees
+
+    def apply_rotation(self):
+        degrees = self.angle
+        if settings.exact_gun_rotation:
+            self.refresh_sprite()
+            self.gun_sprite = surfaces.track(pygame.transform.rotate(self.gun_sprite, degrees), "rotation")
+            self.sprite_offset = (self.gun_sprite.get_width() // 2, self.gun_sprite.get_height() // 2)
+        else:
+            self.gun_sprite, self.sprite_offset = self.rotations.get(degrees)
+
     def blit_position(self):
-        return self.position.x - (self.gun_sprite.get_width() // 2), self.position.y - (self.gun_sprite.get_height() // 2)
+        position = self.render_position()
+        return position.x - self.sprite_offset[0], position.y - self.sprite_offset[1]
 
 class SelectionScreen:
-    def __init__(self, screen, mode='character'):
+    def __init__(self, screen, mode='character', run=True):
         self.screen = screen
         self.mode = mode
-        self.background = pygame.image.load("data/images/latarhome.jpg").convert()
+        self.background = assets.image("data/images/latarhome.jpg", alpha=False)
 
-        self.characters = [
-            pygame.image.load("data/images/Player1.png"),
-            pygame.image.load("data/images/Player2.png"),
-            pygame.image.load("data/images/Player3.png"),
-            pygame.image.load("data/images/Player4.png")
+        self.character_paths = [
+            "data/images/Player1.png",
+            "data/images/Player2.png",
+            "data/images/Player3.png",
+            "data/images/Player4.png"
         ]
+        self.characters = [assets.image(path) for path in self.character_paths]
         self.character_rects = []
 
-        self.backgrounds = [
-            pygame.image.load("data/images/latargame.jpg"),
-            pygame.image.load("data/images/latargame2.jpg"),
-            pygame.image.load("data/images/latargame3.jpg")
+        self.background_paths = [
+            "data/images/latargame.jpg",
+            "data/images/latargame2.jpg",
+            "data/images/latargame3.jpg"
         ]
+        self.backgrounds = [assets.image(path, alpha=False) for path in self.background_paths]
         self.background_rects = []
+        self.character_hovers = []
+        self.background_thumbnails = []
+        self.background_hovers = []
+        self.layout = None
 
         self.back_button_rect = pygame.Rect(10, 10, 100, 50)
         self.init_rects()
-        self.show_selection_screen()
+        if run:
+            SceneManager(screen, {"selection": self}).run("selection")
 
     def init_rects(self):
         screen_width, screen_height = self.screen.get_size()
+        self.layout = (self.mode, self.screen.get_size())
+        self.character_rects = []
+        self.background_rects = []
         
         if self.mode == 'character':
             num_items = len(self.characters)
@@ -385,113 +1987,154 @@ class SelectionScreen:
             for i, character in enumerate(self.characters):
                 rect = character.get_rect(center=(start_x + i * 200 + 100, screen_height // 2))
                 self.character_rects.append(rect)
+            self.character_hovers = [assets.image(path, (character.get_width() + 20, character.get_height() + 20)) for path, character in zip(self.character_paths, self.characters)]
         
         elif self.mode == 'background':
             num_items = len(self.backgrounds)
-            total_width = num_items * 320 + (num_items - 1) * 20 if settings.is_fullscreen else num_items * 230 + (num_items - 1) * 20
+            total_width = num_items * 230 + (num_items - 1) * 20
             start_x = (screen_width - total_width) // 2
 
-            for i, background in enumerate(self.backgrounds):
-                scaled_background = pygame.transform.scale(background, (320, 320) if settings.is_fullscreen else (230, 230))
-                rect = scaled_background.get_rect(center=(start_x + i * (320 + 20) + 160 if settings.is_fullscreen else start_x + i * (230 + 20) + 115, screen_height // 2))
+            thumbnail_size = (230, 230)
+            hover_size = (250, 250)
+            self.background_thumbnails = [assets.image(path, thumbnail_size, alpha=False) for path in self.background_paths]
+            self.background_hovers = [assets.image(path, hover_size, alpha=False) for path in self.background_paths]
+            for i, scaled_background in enumerate(self.background_thumbnails):
+                rect = scaled_background.get_rect(center=(start_x + i * (230 + 20) + 115, screen_height // 2))
                 self.background_rects.append(rect)
 
     def draw_hover_button(self, rect, text):
-        mouse_pos = pygame.mouse.get_pos()
+        mouse_pos = display.mouse_pos()
         color = (180, 20, 20) if rect.collidepoint(mouse_pos) else (160, 160, 160)
         pygame.draw.rect(self.screen, color, rect, border_radius=5)
-        font = pygame.font.Font("data/fonts/Melted Monster.ttf", 30)
-        text_rendered = font.render(text, False, (0, 0, 0))
+        text_rendered = text_cache.render("data/fonts/Melted Monster.ttf", 30, text, False, (0, 0, 0))
         self.screen.blit(text_rendered, (rect.centerx - text_rendered.get_width() // 2, rect.centery - text_rendered.get_height() // 2))
 
-    def show_selection_screen(self):
-        while settings.is_character_selection or settings.is_background_selection:
-            self.clear_screen()
-
-            if self.mode == 'character':
-                for i, character in enumerate(self.characters):
-                    mouse_pos = pygame.mouse.get_pos()
-                    if self.character_rects[i].collidepoint(mouse_pos):
-                        enlarged_character = pygame.transform.scale(character, (character.get_width() + 20, character.get_height() + 20))
-                        enlarged_rect = enlarged_character.get_rect(center=self.character_rects[i].center)
-                        self.screen.blit(enlarged_character, enlarged_rect.topleft)
-                    else:
-                        self.screen.blit(character, self.character_rects[i].topleft)
-                
-                font_size = 60 if settings.is_fullscreen else 40
-                text_position = (self.screen.get_width() // 2, 150 if settings.is_fullscreen else 100)
-                font = pygame.font.Font("data/fonts/Melted Monster.ttf", font_size)
-                text = font.render("Select Your Character", False, (170, 10, 10))
-                text_rect = text.get_rect(center=text_position)
-                self.screen.blit(text, text_rect)
-                
-            elif self.mode == 'background':
-                for i, background in enumerate(self.backgrounds):
-                    mouse_pos = pygame.mouse.get_pos()
-                    scaled_background = pygame.transform.scale(background, (320, 320) if settings.is_fullscreen else (230, 230))
-                    enlarged_background = pygame.transform.scale(background, (340, 340) if settings.is_fullscreen else (250, 250)) if self.background_rects[i].collidepoint(mouse_pos) else scaled_background
-                    rect = enlarged_background.get_rect(center=self.background_rects[i].center) if self.background_rects[i].collidepoint(mouse_pos) else self.background_rects[i]
-                    self.screen.blit(enlarged_background, rect.topleft)
-                
-                font_size = 60 if settings.is_fullscreen else 40
-                text_position = (self.screen.get_width() // 2, 150 if settings.is_fullscreen else 100)
-                font = pygame.font.Font("data/fonts/Melted Monster.ttf", font_size)
-                text = font.render("Select Your Background", False, (170, 10, 10))
-                text_rect = text.get_rect(center=text_position)
-                self.screen.blit(text, text_rect)
-
-            self.draw_hover_button(self.back_button_rect, "Back")
-            pygame.display.flip()
-            self.handle_events()
+    def enter(self):
+        self.mode = 'character' if settings.is_character_selection else 'background'
+        self.init_rects()
 
-    def handle_events(self):
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                sys.exit()
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                mouse_pos = pygame.mouse.get_pos()
-                if self.back_button_rect.collidepoint(mouse_pos):
-                    if self.mode == 'character':
-                        settings.is_character_selection = False
-                        settings.is_menu = True
-                    elif self.mode == 'background':
-                        settings.is_background_selection = False
-                        settings.is_character_selection = True
-                        self.mode = 'character'
-                        self.init_rects()
+    def exit(self):
+        pass
+
+    def is_active(self):
+        return settings.is_character_selection or settings.is_background_selection
+
+    def is_idle(self):
+        return True
+
+    def update(self, frame_time):
+        pass
+
+    def draw(self):
+        self.draw_frame()
+        display.flip()
+
+    def draw_frame(self):
+        if self.layout != (self.mode, self.screen.get_size()):
+            self.init_rects()
+        self.clear_screen()
+        mouse_pos = display.mouse_pos()
+
+        if self.mode == 'character':
+            for i, character in enumerate(self.characters):
+                if self.character_rects[i].collidepoint(mouse_pos):
+                    enlarged_character = self.character_hovers[i]
+                    enlarged_rect = enlarged_character.get_rect(center=self.character_rects[i].center)
+                    self.screen.blit(enlarged_character, enlarged_rect.topleft)
                 else:
-                    if self.mode == 'character':
-                        for i, rect in enumerate(self.character_rects):
-                            if rect.collidepoint(mouse_pos):
-                                settings.selected_character = self.characters[i]
-                                settings.is_character_selection = False
-                                settings.is_background_selection = True
-                                self.mode = 'background'
-                                self.init_rects()
-                                break
-                    elif self.mode == 'background':
-                        for i, rect in enumerate(self.background_rects):
-                            if rect.collidepoint(mouse_pos):
-                                settings.selected_background = ["data/images/latargame.jpg", "data/images/latargame2.jpg", "data/images/latargame3.jpg"][i]
-                                settings.is_background_selection = False
-                                settings.start_game = True
-                                show_loading_screen(self.screen)
-                                return
+                    self.screen.blit(character, self.character_rects[i].topleft)
+            
+            font_size = 40
+            text_position = (self.screen.get_width() // 2, 100)
+            text = text_cache.render("data/fonts/Melted Monster.ttf", font_size, "Select Your Character", False, (170, 10, 10))
+            text_rect = text.get_rect(center=text_position)
+            self.screen.blit(text, text_rect)
+            
+        elif self.mode == 'background':
+            for i, scaled_background in enumerate(self.background_thumbnails):
+                hovered = self.background_rects[i].collidepoint(mouse_pos)
+                enlarged_background = self.background_hovers[i] if hovered else scaled_background
+                rect = enlarged_background.get_rect(center=self.background_rects[i].center) if hovered else self.background_rects[i]
+                self.screen.blit(enlarged_background, rect.topleft)
+            
+            font_size = 40
+            text_position = (self.screen.get_width() // 2, 100)
+            text = text_cache.render("data/fonts/Melted Monster.ttf", font_size, "Select Your Background", False, (170, 10, 10))
+            text_rect = text.get_rect(center=text_position)
+            self.screen.blit(text, text_rect)
+
+        self.draw_hover_button(self.back_button_rect, "Back")
+
+    def handle_event(self, event):
+        if event.type == pygame.MOUSEBUTTONDOWN:
+            mouse_pos = display.mouse_pos()
+            if self.back_button_rect.collidepoint(mouse_pos):
+                if self.mode == 'character':
+                    settings.is_character_selection = False
+                    settings.is_menu = True
+                elif self.mode == 'background':
+                    settings.is_background_selection = False
+                    settings.is_character_selection = True
+                    self.mode = 'character'
+                    self.init_rects()
+            else:
+                if self.mode == 'character':
+                    for i, rect in enumerate(self.character_rects):
+                        if rect.collidepoint(mouse_pos):
+                            settings.selected_character = self.character_paths[i]
+                            settings.is_character_selection = False
+                            settings.is_background_selection = True
+                            self.mode = 'background'
+                            self.init_rects()
+                            break
+                elif self.mode == 'background':
+                    for i, rect in enumerate(self.background_rects):
+                        if rect.collidepoint(mouse_pos):
+                            settings.selected_background = self.background_paths[i]
+                            settings.is_background_selection = False
+                            settings.start_game = True
+                            show_loading_screen(self.screen)
+                            return
 
     def clear_screen(self):
         self.screen.blit(self.background, (0, 0))
 
-def show_loading_screen(screen, duration=3.0):
-    start_time = time.time()
-    font = pygame.font.Font("data/fonts/Melted Monster.ttf", 60)
+def game_manifest(screen_size):
+    manifest = [
+        ("image", settings.selected_background, tuple(screen_size), False),
+        ("image", settings.selected_character, (50, 60), True),
+        ("image", "data/images/Soul.png", (30, 40), True),
+        ("image", "data/images/Baby.png", (70, 80), True),
+        ("image", "data/images/shield.png", (40, 50), True),
+        ("image", "data/images/shield.png", (90, 120), True),
+        ("image", "data/images/Nail.png", (30, 50), True),
+        ("image", "data/images/Fish.png", (30, 50), True),
+        ("image", "data/images/Gun.png", (200, 200), True),
+        ("font", "data/fonts/Montserrat-ExtraBold.ttf", 300),
+        ("font", "data/fonts/Montserrat-ExtraBold.ttf", 30),
+        ("font", "data/fonts/Melted Monster.ttf", 100),
+        ("font", "data/fonts/BLOODY.TTF", 70),
+        ("font", "data/fonts/BLOODY.TTF", 30),
+        ("sound", "data/audio/Gunshot.wav"),
+        ("sound", "data/audio/CantShoot.wav"),
+        ("sound", "data/audio/Shield.mp3")
+    ]
+    if settings.prebuild_rotations:
+        manifest.append(("rotations", "data/images/Gun.png", (200, 200), settings.gun_rotation_step))
+    return manifest
+
+def show_loading_screen(screen, preloader=None):
+    preloader = preloader or assets.preload(game_manifest(screen.get_size()))
+    clock = pygame.time.Clock()
     text = "Loading..."
-    text_surfaces = [font.render(char, False, (255, 255, 255)) for char in text]
-    text_red_surfaces = [font.render(char, False, (170, 0, 0)) for char in text]
-    while time.time() - start_time < duration:
+    text_surfaces = [text_cache.render("data/fonts/Melted Monster.ttf", 60, char, False, (255, 255, 255)) for char in text]
+    text_red_surfaces = [text_cache.render("data/fonts/Melted Monster.ttf", 60, char, False, (170, 0, 0)) for char in text]
+    while True:
+        progress = preloader.poll()
+        pygame.event.pump()
         screen.fill((0, 0, 0))
         
-        elapsed_time = time.time() - start_time
-        num_chars_to_color = int(len(text) * (elapsed_time / duration))
+        num_chars_to_color = int(len(text) * progress)
         
         x_offset = (screen.get_width() - sum(surf.get_width() for surf in text_surfaces)) // 2
         y_offset = screen.get_height() // 2.8
@@ -503,50 +2146,117 @@ def show_loading_screen(screen, duration=3.0):
                 screen.blit(white_surf, (x_offset, y_offset))
             x_offset += white_surf.get_width()
         
-        if settings.is_fullscreen:
-            font_size = 30
-            text_position = (screen.get_width() // 2, screen.get_height() - 250)
-        else:
-            font_size = 20
-            text_position = (screen.get_width() // 2, screen.get_height() - 200)
-        
-        font_small = pygame.font.Font("data/fonts/Melted Monster.ttf", font_size)
-        instructions_text = font_small.render("Tekan spasi jika ingin pause atau melanjutkan game", False, (255, 255, 255))
-        instructions_rect = instructions_text.get_rect(center=text_position)
+        instructions_text = text_cache.render("data/fonts/Melted Monster.ttf", 20, "Tekan spasi jika ingin pause atau melanjutkan game", False, (255, 255, 255))
+        instructions_rect = instructions_text.get_rect(center=(screen.get_width() // 2, screen.get_height() - 200))
         screen.blit(instructions_text, instructions_rect)
-        pygame.display.flip()
-        pygame.time.delay(50)
+        display.flip()
+        if preloader.done:
+            return
+        clock.tick(60)
 
 class Game:
-    def __init__(self, screen):
+    def __init__(self, screen, input_source=None, headless=False, run=True, seed=None):
         self.screen = screen
-        self.load_background()
-        self.player = Player(Vector2(400, 200), pygame.transform.scale(settings.selected_character, (50, 60)))
+        self.headless = headless
+        self.recorder = None
+        self.replaying = False
+        self.rounds = 0
+        self.world_size = screen.get_size()
+        self.input = input_source or MouseInput()
+        self.batch = SpriteBatch(assets.sprite_atlas()) if settings.batch_sprites and not headless else None
+        self.sprite_group = pygame.sprite.LayeredDirty() if settings.sprite_groups and not headless else None
+        self.collectible_sprites = {}
         self.collectibles = []
-        self.clock = pygame.time.Clock()
+        self.spatial_hash = SpatialHash()
+        self.enemies = None
+        self.particles = None
+        self.player = None
+        self.renderer = DirtyRectRenderer(screen)
+        self.started = False
+        self.paused_state = None
+        self.reset(seed)
+        if run and not headless:
+            SceneManager(screen, {"game": self, "game_over": GameOverScreen(screen)}).run("game")
+
+    def reset(self, seed=None):
+        if self.player is not None:
+            self.release_entities()
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.rng = random.Random(self.seed)
+        if not self.headless:
+            self.load_background()
+        self.player = Player(Vector2(400, 200), assets.animation(settings.selected_character, (50, 60)))
+        self.player.world_size = self.world_size
+        if settings.numpy_enemies and numpy is not None:
+            if self.enemies is None:
+                self.enemies = EnemySwarm()
+            self.enemies.count = 0
+        else:
+            self.enemies = None
+        if self.particles is None and numpy is not None and not self.headless:
+            self.particles = ParticleSystem(seed=self.seed)
+        self.player.gun.particles = self.particles
+        self.renderer.invalidate()
         self.score = 0
-        self.load_music()
-        self.play_music()
+        self.time = 0
+        settings.sim_time = 0
+        self.tick = 0
+        self.accumulator = 0
         self.enemy_iteration = 0
         self.wave_iteration = 0
+        self.min_time = settings.spawn_min_time
+        self.max_time = settings.spawn_max_time
+        self.next_spawn_time = 0
         self.is_game_over = False
+        self.character = settings.selected_character
+        self.score_saved = False
+        self.collision_time = 0
+        self.collision_steps = 0
         self.populate_collectibles()
-        self.update()
+        if settings.stress_enemies:
+            self.spawn_enemies(settings.stress_enemies)
+
+    def enter(self):
+        if self.started:
+            self.reset(settings.seed)
+        self.started = True
+        self.paused_state = None
+        self.renderer.invalidate()
+        if not self.headless:
+            if settings.record_path:
+                root, extension = os.path.splitext(settings.record_path)
+                path = settings.record_path if self.rounds == 0 else f"{root}_{self.rounds}{extension}"
+                self.recorder = ReplayRecorder(path, self, self.input)
+                self.input = self.recorder
+            self.play_music()
+        self.rounds += 1
+
+    def exit(self):
+        self.stop_music()
+        self.release_entities()
+        if self.recorder is not None:
+            self.recorder.close()
+            self.input = self.recorder.source
+            self.recorder = None
+        if settings.profile_path:
+            profiler.export(settings.profile_path)
+        if settings.surface_report_path:
+            surfaces.export(settings.surface_report_path)
+
+    def is_active(self):
+        return not self.is_game_over
+
+    def is_idle(self):
+        return settings.is_paused
 
     def load_background(self):
-        self.background = pygame.image.load(settings.selected_background).convert()
-        self.background = pygame.transform.scale(self.background, self.screen.get_size())
-
-    def load_music(self):
-        mixer.init()
-        mixer.music.load("data/audio/songgame.mp3")
+        self.background = assets.image(settings.selected_background, self.screen.get_size(), alpha=False)
 
     def play_music(self):
-        mixer.music.set_volume(0.2)
-        mixer.music.play(-1)
+        audio.play_music("data/audio/songgame.mp3", 0.2)
 
     def stop_music(self):
-        mixer.music.stop()
+        audio.stop_music()
 
     def populate_collectibles(self):
         self.populate_collectible("soul", 2)
@@ -554,25 +2264,41 @@ class Game:
         self.populate_collectible("shield", 1)
 
     def populate_collectible(self, collectible_type, count):
-        screen_width, screen_height = self.screen.get_size()
+        screen_width, screen_height = self.world_size
         for _ in range(count):
-            pos = Vector2()
-            pos.x = random.randint(100, screen_width - 100)
-            pos.y = random.randint(100, screen_height - 100)
-            collectible = Collectible(pos, collectible_type)
-            self.collectibles.append(collectible)
+            x = self.rng.randint(100, screen_width - 100)
+            y = self.rng.randint(100, screen_height - 100)
+            collectible = collectible_pool.acquire((x, y), collectible_type, self.rng)
+            self.add_collectible(collectible)
 
     def spawn_enemies(self, count):
-        screen_width = self.screen.get_width()
+        screen_width = self.world_size[0]
+        if self.enemies is not None:
+            xs, speeds, sprite_indices = [], [], []
+            for _ in range(count):
+                xs.append(self.rng.randint(0, screen_width - 40))
+                sprite_indices.append(self.rng.randint(0, 1))
+                speeds.append(self.rng.randint(*settings.enemy_speed))
+            self.enemies.spawn(xs, -35, speeds, sprite_indices)
+            return
         for _ in range(count):
-            pos = Vector2()
-            pos.x = random.randint(0, screen_width - 40)
-            pos.y = -35
-            enemy = Collectible(pos, "enemy")
-            self.collectibles.append(enemy)
+            x = self.rng.randint(0, screen_width - 40)
+            enemy = collectible_pool.acquire((x, -35), "enemy", self.rng)
+            self.add_collectible(enemy)
+
+    def add_collectible(self, collectible):
+        self.collectibles.append(collectible)
+        self.spatial_hash.insert(collectible)
 
     def repopulate_collectible(self, collectible_type):
-        self.collectibles = [c for c in self.collectibles if c.collectible_type != collectible_type]
+        remaining = []
+        for collectible in self.collectibles:
+            if collectible.collectible_type == collectible_type:
+                self.spatial_hash.remove(collectible)
+                collectible_pool.release(collectible)
+            else:
+                remaining.append(collectible)
+        self.collectibles = remaining
         if collectible_type == "soul":
             self.populate_collectible("soul", 2)
         elif collectible_type == "baby":
@@ -580,107 +2306,403 @@ class Game:
         elif collectible_type == "shield":
             self.populate_collectible("shield", 1)
 
-    def update(self):
-        next_time = time.time()
-        elapsed_time = time.time()
-        min_time = 5
-        max_time = 10
-        while not settings.is_menu and not settings.is_character_selection:
-            self.handle_dt()
-            self.clear_screen()
-
-            if not settings.is_paused:
-                self.player.gun.render_current_ammo(screen)
-                self.draw_collectibles()
-                self.player.move()
-                self.player.handle_gun()
-                self.player.collision_detection(self)
-                self.player.check_state()
-                self.player.draw(self.screen)
-
-                self.score = self.player.score
-                self.render_score()
-                self.render_wave()
-
-            if settings.is_paused:
-                self.render_pause_screen()
-
-            pygame.display.flip()
-            self.handle_events()
-
-            self.player.check_state()
-            if self.player.is_dead:
-                self.is_game_over = True
-                game_over_screen = GameOverScreen(self.screen, self.player.score)
-                result = game_over_screen.show_game_over_screen()
-                if result == "back_to_home":
-                    settings.is_menu = True
+    def run_frame(self, frame_time):
+        profiler.begin_frame()
+        start = profiler.start()
+        self.handle_events()
+        profiler.stop("events", start)
+        self.update(frame_time)
+        self.draw()
+        profiler.end_frame()
+
+    def update(self, frame_time):
+        if settings.is_paused or self.is_game_over:
+            return
+        self.advance(min(frame_time, 0.25) * settings.playback_speed)
+        start = profiler.start()
+        self.player.check_state()
+        profiler.stop("check_state", start)
+        if self.player.is_dead:
+            self.is_game_over = True
+            self.save_score()
+
+    def draw(self):
+        if settings.is_paused:
+            state = (display.generation, profiler.show_overlay)
+            if state == self.paused_state:
+                return
+            self.paused_state = state
+        else:
+            self.paused_state = None
+        start = profiler.start()
+        self.clear_screen()
+        profiler.stop("clear_screen", start)
+
+        if not settings.is_paused:
+            start = profiler.start()
+            self.renderer.mark(self.player.gun.render_current_ammo(self.screen))
+            profiler.stop("hud", start)
+            if self.batch is not None:
+                start = profiler.start()
+                self.draw_collectibles(self.batch)
+                profiler.stop("draw_collectibles", start)
+                start = profiler.start()
+                self.player.draw(self.batch)
+                profiler.stop("draw_player", start)
+                start = profiler.start()
+                self.renderer.mark(self.batch.flush(self.screen))
+                profiler.stop("draw_batch", start)
+            else:
+                start = profiler.start()
+                self.renderer.mark(self.draw_collectibles())
+                profiler.stop("draw_collectibles", start)
+                start = profiler.start()
+                self.renderer.mark(self.player.draw(self.screen))
+                profiler.stop("draw_player", start)
+
+            start = profiler.start()
+            self.score = self.player.score
+            self.renderer.mark(self.render_score())
+            self.renderer.mark(self.render_wave())
+            profiler.stop("hud", start)
+
+        if settings.is_paused:
+            self.renderer.mark(self.render_pause_screen())
+
+        self.renderer.mark(profiler.draw_overlay(self.screen))
+        start = profiler.start()
+        self.present()
+        profiler.stop("flip", start)
+
+    def advance(self, frame_time):
+        settings.dt = settings.fixed_dt
+        self.accumulator += frame_time
+        steps = 0
+        while self.accumulator >= settings.fixed_dt and not self.player.is_dead:
+            if steps == settings.max_steps_per_frame * math.ceil(settings.playback_speed):
+                self.accumulator = 0
+                break
+            self.save_positions()
+            self.step()
+            self.accumulator -= settings.fixed_dt
+            steps += 1
+        settings.alpha = min(1.0, self.accumulator / settings.fixed_dt)
+        return steps
+
+    def save_positions(self):
+        self.player.save_position()
+        for collectible in self.collectibles:
+            if collectible.collectible_type == "enemy":
+                collectible.save_position()
+        if self.enemies is not None:
+            self.enemies.save_positions()
+        if self.particles is not None:
+            self.particles.save_positions()
+
+    def step(self):
+        position, clicks = self.input.poll(self.tick)
+        self.player.aim.update(position)
+        for _ in range(clicks):
+            self.player.shoot()
+            self.player.gun.shoot(self.player.aim)
+        start = profiler.start()
+        self.update_collectibles()
+        profiler.stop("update_collectibles", start)
+        start = profiler.start()
+        self.player.move()
+        profiler.stop("move", start)
+        start = profiler.start()
+        self.player.handle_gun()
+        self.player.gun.update()
+        if self.particles is not None:
+            self.particles.update(settings.dt)
+        profiler.stop("handle_gun", start)
+        collision_start = time.perf_counter()
+        self.player.collision_detection(self)
+        collision_time = time.perf_counter() - collision_start
+        profiler.stop("collision_detection", collision_start)
+        self.collision_time += collision_time
+        self.collision_steps += 1
+        self.time += settings.dt
+        settings.sim_time = self.time
+        self.tick += 1
+        self.update_waves()
+
+    def update_waves(self):
+        if self.time > self.next_spawn_time:
+            self.next_spawn_time = self.time + self.rng.randint(self.min_time, self.max_time)
+            self.spawn_enemies(settings.stress_enemies or self.rng.randint(*settings.wave_size))
+            self.enemy_iteration += 1
+            self.wave_iteration += 1
+            surfaces.sample(self.wave_iteration)
+            if settings.stress_enemies:
+                self.report_collision_cost()
+            if self.enemy_iteration >= settings.waves_per_escalation and self.min_time > 1:
+                self.min_time -= 1
+                self.max_time -= 1
+                self.enemy_iteration = 0
+
+    def simulate(self, max_ticks, dt=None):
+        self.run_until(max_ticks, dt)
+        result = self.result()
+        self.release_entities()
+        return result
+
+    def run_until(self, tick, dt=None):
+        settings.dt = dt or settings.fixed_dt
+        while self.tick < tick and not self.player.is_dead:
+            self.step()
+        self.score = self.player.score
+
+    def snapshot(self):
+        player = self.player
+        gun = player.gun
+        state = {
+            "tick": self.tick,
+            "time": self.time,
+            "rng": self.rng.getstate(),
+            "enemy_iteration": self.enemy_iteration,
+            "wave_iteration": self.wave_iteration,
+            "min_time": self.min_time,
+            "max_time": self.max_time,
+            "next_spawn_time": self.next_spawn_time,
+            "player": {
+                "position": list(player.position),
+                "previous_position": list(player.previous_position),
+                "velocity": list(player.velocity),
+                "offset": list(player.offset),
+                "aim": list(player.aim),
+                "time": player.time,
+                "ignore_until": player.ignore_enemy_collision_until,
+                "score": player.score,
+                "is_dead": player.is_dead,
+                "shield_timer": player.shield_sprite_timer,
+                "shield_alpha": player.shield_alpha,
+                "soul_count": gun.soul_count,
+                "angle": gun.angle,
+                "explosions": [[e.position.x, e.position.y, e.width] for e in gun.explosions]
+            },
+            "collectibles": [[c.collectible_type, c.position.x, c.position.y, c.previous_position.y, c.gravity_scale, c.variant] for c in self.collectibles]
+        }
+        if self.enemies is not None:
+            count = self.enemies.count
+            state["enemies"] = {
+                "positions": self.enemies.positions[:count].tolist(),
+                "previous_positions": self.enemies.previous_positions[:count].tolist(),
+                "velocities": self.enemies.velocities[:count].tolist(),
+                "sprite_indices": self.enemies.sprite_indices[:count].tolist()
+            }
+        return state
+
+    def restore(self, state):
+        self.release_entities()
+        self.tick = state["tick"]
+        self.time = state["time"]
+        settings.sim_time = self.time
+        version, internal, gauss = state["rng"]
+        self.rng.setstate((version, tuple(internal), gauss))
+        self.enemy_iteration = state["enemy_iteration"]
+        self.wave_iteration = state["wave_iteration"]
+        self.min_time = state["min_time"]
+        self.max_time = state["max_time"]
+        self.next_spawn_time = state["next_spawn_time"]
+        self.accumulator = 0
+
+        player_state = state["player"]
+        player = self.player
+        player.position.update(player_state["position"])
+        player.previous_position.update(player_state["previous_position"])
+        player.velocity.update(player_state["velocity"])
+        player.offset.update(player_state["offset"])
+        player.aim.update(player_state["aim"])
+        player.time = player_state["time"]
+        player.ignore_enemy_collision_until = player_state["ignore_until"]
+        player.score = player_state["score"]
+        player.is_dead = player_state["is_dead"]
+        player.shield_sprite_timer = player_state["shield_timer"]
+        player.shield_alpha = player_state["shield_alpha"]
+        player.shield_sprite = player.shield_animation if player.shield_sprite_timer > 0 else None
+        player.gun.soul_count = player_state["soul_count"]
+        player.gun.angle = player_state["angle"]
+        for x, y, width in player_state["explosions"]:
+            explosion = explosion_pool.acquire((x, y))
+            explosion.width = width
+            player.gun.explosions.append(explosion)
+
+        for collectible_type, x, y, previous_y, gravity_scale, variant in state["collectibles"]:
+            collectible = collectible_pool.acquire((x, y), collectible_type)
+            collectible.previous_position.y = previous_y
+            if collectible_type == "enemy":
+                collectible.gravity_scale = gravity_scale
+                collectible.set_variant(variant)
+            self.add_collectible(collectible)
+
+        if self.enemies is not None:
+            self.enemies.count = 0
+            enemies = state.get("enemies")
+            if enemies and enemies["positions"]:
+                count = len(enemies["positions"])
+                self.enemies.reserve(count)
+                self.enemies.positions[:count] = enemies["positions"]
+                self.enemies.previous_positions[:count] = enemies["previous_positions"]
+                self.enemies.velocities[:count] = enemies["velocities"]
+                self.enemies.sprite_indices[:count] = enemies["sprite_indices"]
+                self.enemies.count = count
+        self.score = player.score
+
+    def release_entities(self):
+        collectible_pool.release_all(self.collectibles)
+        explosion_pool.release_all(self.player.gun.explosions)
+        self.collectibles = []
+        self.player.gun.explosions = []
+        self.spatial_hash.clear()
+        if self.particles is not None:
+            self.particles.clear()
+        self.collectible_sprites.clear()
+        if self.sprite_group is not None:
+            self.sprite_group.empty()
+
+    def result(self):
+        return {
+            "score": self.player.score,
+            "wave": self.wave_iteration,
+            "ticks": self.tick,
+            "time": round(self.time, 3),
+            "dead": self.player.is_dead
+        }
 
-            if self.is_game_over:
-                mixer.music.play(-1)
-                self.stop_music()
-
-            elapsed_time = time.time()
-            if elapsed_time > next_time:
-                next_time = elapsed_time + random.randint(min_time, max_time)
-                self.spawn_enemies(random.randint(1, 3))
-                self.enemy_iteration += 1
-                self.wave_iteration += 1
-                if self.enemy_iteration > 2 and min_time > 1:
-                    min_time -= 1
-                    max_time -= 1
-                    self.enemy_iteration = 0
+    def save_score(self):
+        if self.score_saved or settings.headless or self.replaying:
+            return
+        self.score_saved = True
+        scores.record(self.player.score, self.character, settings.selected_background, self.wave_iteration, round(self.time, 3))
+
+    def entity_count(self):
+        return len(self.collectibles) + (self.enemies.count if self.enemies is not None else 0)
+
+    def report_collision_cost(self):
+        if self.collision_steps:
+            average = self.collision_time / self.collision_steps * 1000
+            print(f"Wave {self.wave_iteration}: {self.entity_count()} collectibles, collision {average:.4f} ms/step")
+        self.collision_time = 0
+        self.collision_steps = 0
 
     def handle_events(self):
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 sys.exit()
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_SPACE:
-                    settings.is_paused = not settings.is_paused
-            if event.type == pygame.MOUSEBUTTONDOWN and not settings.is_paused:
-                self.player.shoot()
-                self.player.gun.shoot()
+            display.handle_event(event)
+            self.handle_event(event)
+
+    def handle_event(self, event):
+        if event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_SPACE:
+                settings.is_paused = not settings.is_paused
+                self.renderer.invalidate()
+            if event.key == pygame.K_F2:
+                settings.exact_gun_rotation = not settings.exact_gun_rotation
+            if event.key == pygame.K_F3:
+                profiler.toggle_overlay()
+                self.renderer.invalidate()
+            if event.key == pygame.K_F4:
+                profiler.export(settings.profile_path or time.strftime("profile_%Y%m%d_%H%M%S.json"))
+            if event.key == pygame.K_F5:
+                for name, stats in cache_stats().items():
+                    print(f"{name}: " + ", ".join(f"{key} {value}" for key, value in stats.items()))
+                if surfaces.enabled:
+                    print(surfaces.report())
+        if event.type == pygame.MOUSEBUTTONDOWN and not settings.is_paused:
+            self.input.click()
 
     def clear_screen(self):
-        screen_width, screen_height = self.screen.get_size()
-        background = pygame.transform.scale(self.background, (screen_width, screen_height))
-        self.screen.blit(background, (0, 0))
+        background = assets.image(settings.selected_background, self.screen.get_size(), alpha=False)
+        if settings.dirty_rects:
+            self.renderer.begin(background)
+        else:
+            self.screen.blit(background, (0, 0))
 
-    def handle_dt(self):
-        settings.dt = self.clock.tick() / 1000
+    def present(self):
+        if settings.dirty_rects:
+            self.renderer.present()
+        else:
+            display.flip()
 
     def render_pause_screen(self):
-        font = pygame.font.Font("data/fonts/Melted Monster.ttf", 100)
-        pause_text = font.render("Paused", False, (255, 255, 255))
+        pause_text = text_cache.render("data/fonts/Melted Monster.ttf", 100, "Paused", False, (255, 255, 255))
         text_rect = pause_text.get_rect(center=(self.screen.get_width() // 2, self.screen.get_height() // 2 - 50))
-        self.screen.blit(pause_text, text_rect)
+        return self.screen.blit(pause_text, text_rect)
 
     def render_wave(self):
-        font = pygame.font.Font("data/fonts/Montserrat-ExtraBold.ttf", 30)
-        wave_text = font.render("Wave: " + str(self.wave_iteration), True, (180, 180, 180))
+        wave_text = text_cache.render("data/fonts/Montserrat-ExtraBold.ttf", 30, "Wave: " + str(self.wave_iteration), True, (180, 180, 180))
         screen_width = self.screen.get_width()
         text_rect = wave_text.get_rect(topright=(screen_width - 10, 10))
-        self.screen.blit(wave_text, text_rect.topleft)
+        return self.screen.blit(wave_text, text_rect.topleft)
 
     def render_score(self):
-        font = pygame.font.Font("data/fonts/Montserrat-ExtraBold.ttf", 30)
-        score_text = font.render("Score: " + str(self.score), True, (180, 180, 180))
-        self.screen.blit(score_text, (10, 10))
-
-    def draw_collectibles(self):
+        score_text = text_cache.render("data/fonts/Montserrat-ExtraBold.ttf", 30, "Score: " + str(self.score), True, (180, 180, 180))
+        return self.screen.blit(score_text, (10, 10))
+
+    def update_collectibles(self):
+        screen_height = self.world_size[1]
+        if self.enemies is not None:
+            self.enemies.update(settings.dt)
+            for x, variant in self.enemies.cull(screen_height):
+                self.crash(x, variant)
+        remaining = []
+        for collectible in self.collectibles:
+            collectible.update()
+            if collectible.collectible_type != "enemy":
+                remaining.append(collectible)
+            elif collectible.position.y > screen_height:
+                self.crash(collectible.position.x, collectible.variant)
+                self.spatial_hash.remove(collectible)
+                collectible_pool.release(collectible)
+            else:
+                self.spatial_hash.move(collectible)
+                remaining.append(collectible)
+        self.collectibles = remaining
+
+    def crash(self, x, variant):
+        if self.particles is not None:
+            self.particles.debris((x + 15, self.world_size[1]), variant)
+
+    def draw_collectibles(self, target=None):
+        target = target or self.screen
+        if self.sprite_group is not None:
+            rects = self.draw_collectible_sprites()
+        else:
+            rects = [collectible.draw(target) for collectible in self.collectibles]
+        if self.enemies is not None:
+            rects.extend(self.enemies.draw(target))
+        return rects
+
+    def draw_collectible_sprites(self):
+        sprites = self.collectible_sprites
+        live = set(self.collectibles)
+        for collectible in [collectible for collectible in sprites if collectible not in live]:
+            sprites.pop(collectible).kill()
         for collectible in self.collectibles:
-            collectible.draw(self.screen)
-            if collectible.collectible_type == "enemy" and collectible.position.y > self.screen.get_height():
-                self.collectibles.remove(collectible)
+            sprite = sprites.get(collectible)
+            if sprite is None:
+                sprite = AtlasSprite(assets.atlas)
+                sprites[collectible] = sprite
+                self.sprite_group.add(sprite)
+            sprite.set_surface(collectible.sprite)
+            position = collectible.render_position()
+            sprite.rect.topleft = (int(position.x), int(position.y))
+        self.renderer.mark(self.sprite_group.draw(self.screen))
+        return []
 
 class GameOverScreen:
-    def __init__(self, screen, score):
+    def __init__(self, screen, score=0):
         self.background_color = 240, 240, 240
         self.screen = screen
         self.score = score
         self.screen_center = screen.get_rect().center
         self.is_hovered = False
+        self.pointer_hovered = False
+        self.result = None
+        self.generation = None
 
         button_width = 300
         button_height = 50
@@ -689,52 +2711,72 @@ class GameOverScreen:
         button_y = 450
         self.back_to_home_button_rect = pygame.Rect(button_x, button_y, button_width, button_height)
 
-    def show_game_over_screen(self):
-        pygame.font.init()
+    def enter(self):
+        self.result = None
+        self.generation = None
+        self.is_hovered = self.pointer_hovered = self.back_to_home_button_rect.collidepoint(display.mouse_pos())
 
-        while True:
-            self.clear_screen()
+    def exit(self):
+        pass
 
-            font = pygame.font.Font("data/fonts/BLOODY.ttf", 70)
-            text = font.render("Game Over", False, (100, 100, 100))
-            text_rect = text.get_rect(center=(self.screen_center[0], self.screen_center[1]-100))
-            self.screen.blit(text, text_rect)
+    def is_active(self):
+        return self.result is None
 
-            font = pygame.font.Font("data/fonts/BLOODY.ttf", 30)
-            score_text = font.render("Your Score: " + str(self.score), False, (180, 180, 180))
-            score_text_rect = score_text.get_rect(center=(self.screen_center[0], self.screen_center[1]-30))
-            self.screen.blit(score_text, score_text_rect)
+    def is_idle(self):
+        return True
 
-            button_color = (105, 10, 20) if not self.is_hovered else (180, 180, 180)
-            pygame.draw.rect(self.screen, button_color, self.back_to_home_button_rect)
-            font = pygame.font.Font("data/fonts/BLOODY.ttf", 30)
-            back_to_home_text = font.render("Back to Home", False, (0, 0, 0))
-            back_to_home_text_rect = back_to_home_text.get_rect(center=self.back_to_home_button_rect.center)
-            self.screen.blit(back_to_home_text, back_to_home_text_rect)
+    def handle_event(self, event):
+        if event.type == pygame.MOUSEBUTTONDOWN:
+            mouse_pos = display.mouse_pos()
+            if self.back_to_home_button_rect.collidepoint(mouse_pos):
+                settings.is_character_selection = True
+                settings.is_menu = True
+                self.result = "back_to_home"
+        if event.type == pygame.MOUSEMOTION:
+            self.pointer_hovered = self.back_to_home_button_rect.collidepoint(display.to_logical(event.pos))
 
-            pygame.display.flip()
+    def update(self, frame_time):
+        pass
 
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    sys.exit()
-                if event.type == pygame.MOUSEBUTTONDOWN:
-                    mouse_pos = pygame.mouse.get_pos()
-                    if self.back_to_home_button_rect.collidepoint(mouse_pos):
-                        settings.is_character_selection = True
-                        settings.is_menu = True
-                        return "back_to_home"
-                if event.type == pygame.MOUSEMOTION:
-                    self.is_hovered = self.back_to_home_button_rect.collidepoint(event.pos)
+    def draw(self):
+        if self.generation != display.generation:
+            self.is_hovered = self.pointer_hovered
+            self.draw_frame()
+            display.flip()
+            self.generation = display.generation
+        elif self.pointer_hovered != self.is_hovered:
+            self.is_hovered = self.pointer_hovered
+            display.update([self.draw_button()])
+
+    def draw_frame(self):
+        self.clear_screen()
+
+        text = text_cache.render("data/fonts/BLOODY.TTF", 70, "Game Over", False, (100, 100, 100))
+        text_rect = text.get_rect(center=(self.screen_center[0], self.screen_center[1]-100))
+        self.screen.blit(text, text_rect)
+
+        score_text = text_cache.render("data/fonts/BLOODY.TTF", 30, "Your Score: " + str(self.score), False, (180, 180, 180))
+        score_text_rect = score_text.get_rect(center=(self.screen_center[0], self.screen_center[1]-30))
+        self.screen.blit(score_text, score_text_rect)
+
+        self.draw_button()
+
+    def draw_button(self):
+        button_color = (105, 10, 20) if not self.is_hovered else (180, 180, 180)
+        pygame.draw.rect(self.screen, button_color, self.back_to_home_button_rect)
+        back_to_home_text = text_cache.render("data/fonts/BLOODY.TTF", 30, "Back to Home", False, (0, 0, 0))
+        back_to_home_text_rect = back_to_home_text.get_rect(center=self.back_to_home_button_rect.center)
+        self.screen.blit(back_to_home_text, back_to_home_text_rect)
+        return self.back_to_home_button_rect
 
     def clear_screen(self):
         self.screen.fill((0, 0, 0))
 
 class Menu:
-    def __init__(self, screen):
+    def __init__(self, screen, run=True):
         self.background_color = 240, 240, 240
-        self.background = pygame.image.load("data/images/latarhome.jpg").convert()
-        self.quit_button_size_halfscreen = 60
-        self.quit_button_size_fullscreen = 80
+        self.background = assets.image("data/images/latarhome.jpg", alpha=False)
+        self.quit_button_size = 60
         self.quit_button_margin = 20
         self.screen = screen
         self.set_quit_button_position()
@@ -752,12 +2794,19 @@ class Menu:
         self.volume_up_button_rect = pygame.Rect(250, 370, 140, 50)
         self.volume_down_button_rect = pygame.Rect(410, 370, 140, 50)
         self.is_settings_menu = False
-        self.show_menu()
+        self.highscore_value = ""
+        self.frame = None
+        self.frame_key = None
+        self.hovered = None
+        self.generation = None
+        self.entered = False
+        if run:
+            SceneManager(screen, {"menu": self}).run("menu")
         self.center_buttons()
 
     def set_quit_button_position(self):
         screen_width, screen_height = self.screen.get_size()
-        quit_button_size = self.quit_button_size_fullscreen if settings.is_fullscreen else self.quit_button_size_halfscreen
+        quit_button_size = self.quit_button_size
         quit_button_x = screen_width - quit_button_size - self.quit_button_margin
         quit_button_y = screen_height - quit_button_size - self.quit_button_margin
         self.quit_button_rect = pygame.Rect(quit_button_x, quit_button_y, quit_button_size, quit_button_size)
@@ -792,80 +2841,140 @@ class Menu:
 
         self.set_quit_button_position()
 
-    def show_menu(self):
-        pygame.font.init()
+    def enter(self):
+        self.load_highscore()
+        self.generation = None
+        self.entered = True
 
-        sound = mixer.Sound("data/audio/Error.wav")
-        sound.set_volume(0.05)
-        sound.play()
+    def exit(self):
+        pass
 
-        highscore_value = ""
-        try:
-            with open("data/serialisation/highscore.txt", "r") as highscore_file:
-                highscore_value = highscore_file.readline()
-        except FileNotFoundError:
-            print("Error: Highscore file not found.")
-        except Exception as e:
-            print("Error:", e)
+    def is_active(self):
+        return settings.is_menu or self.is_settings_menu
 
-        while settings.is_menu or self.is_settings_menu:
-            self.clear_screen()
-            self.center_buttons()
+    def is_idle(self):
+        return True
 
-            if settings.is_menu:
-                self.draw_main_menu(highscore_value)
-            elif self.is_settings_menu:
-                self.draw_settings_menu()
+    def update(self, frame_time):
+        pass
+
+    def draw(self):
+        self.present()
+        if not self.entered:
+            return
+        self.entered = False
+        if settings.exit_after_first_frame:
+            print(f"First menu frame after {(time.perf_counter() - STARTUP_TIME) * 1000:.1f} ms")
+            pygame.quit()
+            sys.exit()
+        self.play_music()
+        audio.play("data/audio/Error.wav", 0.05, "ui")
+
+    def present(self):
+        if self.frame_key != self.state() or self.generation != display.generation:
+            self.draw_frame()
+            display.flip()
+            self.generation = display.generation
+            return
+        rects = self.refresh_hover()
+        if rects:
+            display.update(rects)
 
-            pygame.display.flip()
-            self.handle_events()
+    def play_music(self):
+        audio.play_music("data/audio/home.mp3", settings.volume)
+
+    def load_highscore(self):
+        self.highscore_value = scores.highscore()
+
+    def state(self):
+        return settings.is_menu, self.is_settings_menu, self.instructions_visible, self.highscore_value, settings.is_fullscreen
+
+    def compose(self):
+        key = self.state()
+        if key == self.frame_key:
+            return
+        self.clear_screen()
+        self.center_buttons()
+
+        if settings.is_menu:
+            self.draw_main_menu(self.highscore_value)
+        elif self.is_settings_menu:
+            self.draw_settings_menu()
+        self.frame = surfaces.track(self.screen.copy(), "frame")
+        self.frame_key = key
+
+    def buttons(self):
+        if settings.is_menu:
+            return [(self.quit_button_rect, "Quit"), (self.play_button_rect, "Play"), (self.help_button_rect, "Help"), (self.settings_button_rect, "Settings")]
+        if self.is_settings_menu:
+            return [(self.back_button_rect, "Back"), (self.fullscreen_button_rect, "Fullscreen" if not settings.is_fullscreen else "Halfscreen"),
+                    (self.volume_up_button_rect, "Volume +"), (self.volume_down_button_rect, "Volume -")]
+        return []
+
+    def hovered_button(self):
+        mouse_pos = display.mouse_pos()
+        for button in self.buttons():
+            if button[0].collidepoint(mouse_pos):
+                return button
+        return None
+
+    def draw_frame(self):
+        self.compose()
+        self.screen.blit(self.frame, (0, 0))
+        self.hovered = self.hovered_button()
+        if self.hovered is not None:
+            self.draw_button(*self.hovered, True)
+
+    def refresh_hover(self):
+        hovered = self.hovered_button()
+        if hovered == self.hovered:
+            return []
+        rects = []
+        if self.hovered is not None:
+            self.screen.blit(self.frame, self.hovered[0], self.hovered[0])
+            rects.append(self.hovered[0])
+        if hovered is not None:
+            self.draw_button(*hovered, True)
+            rects.append(hovered[0])
+        self.hovered = hovered
+        return rects
 
     def draw_main_menu(self, highscore_value):
-        font = pygame.font.Font("data/fonts/Melted Monster.ttf", 100)
-        text = font.render("Ghost Jump", False, (170, 10, 10))
+        text = text_cache.render("data/fonts/Melted Monster.ttf", 100, "Ghost Jump", False, (170, 10, 10))
         text_x = (self.screen.get_width() - text.get_width()) // 2
         text_y = 150
         self.screen.blit(text, (text_x, text_y))
 
-        self.draw_button(self.quit_button_rect, "Quit")
-        self.draw_button(self.play_button_rect, "Play")
-        self.draw_button(self.help_button_rect, "Help")
-        self.draw_button(self.settings_button_rect, "Settings")
+        for rect, label in self.buttons():
+            self.draw_button(rect, label)
 
         if self.instructions_visible:
             self.display_instructions()
         else:
-            highscore_font_size = 50 if settings.is_fullscreen else int(self.screen.get_width() * 0.04)
-            font = pygame.font.Font("data/fonts/Melted Monster.ttf", highscore_font_size)
-            highscore = font.render("Highscore: " + str(highscore_value), False, (180, 180, 180))
-            highscore_rect = highscore.get_rect(center=(self.screen.get_width() // 2, self.screen.get_height() * 0.65 if settings.is_fullscreen else self.screen.get_height() * 0.75))
+            highscore_font_size = int(self.screen.get_width() * 0.04)
+            highscore = text_cache.render("data/fonts/Melted Monster.ttf", highscore_font_size, "Highscore: " + str(highscore_value), False, (180, 180, 180))
+            highscore_rect = highscore.get_rect(center=(self.screen.get_width() // 2, self.screen.get_height() * 0.75))
             self.screen.blit(highscore, highscore_rect)
 
     def draw_settings_menu(self):
-        font = pygame.font.Font("data/fonts/Melted Monster.ttf", 80)
-        text = font.render("Settings", False, (170, 10, 10))
+        text = text_cache.render("data/fonts/Melted Monster.ttf", 80, "Settings", False, (170, 10, 10))
         text_x = (self.screen.get_width() - text.get_width()) // 2
         text_y = 150
         self.screen.blit(text, (text_x, text_y))
 
-        self.draw_button(self.back_button_rect, "Back")
-        self.draw_button(self.fullscreen_button_rect, "Fullscreen" if not settings.is_fullscreen else "Halfscreen")
-        self.draw_button(self.volume_up_button_rect, "Volume +")
-        self.draw_button(self.volume_down_button_rect, "Volume -")
+        for rect, label in self.buttons():
+            self.draw_button(rect, label)
 
     def clear_screen(self):
         self.screen.blit(self.background, (0, 0))
 
-    def handle_events(self):
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                sys.exit()
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                mouse_pos = pygame.mouse.get_pos()
-                if settings.is_menu:
-                    self.handle_main_menu_events(mouse_pos)
-                elif self.is_settings_menu:
-                    self.handle_settings_menu_events(mouse_pos)
+    def handle_event(self, event):
+        if event.type == pygame.MOUSEBUTTONDOWN:
+            mouse_pos = display.mouse_pos()
+            if settings.is_menu:
+                self.handle_main_menu_events(mouse_pos)
+            elif self.is_settings_menu:
+                self.handle_settings_menu_events(mouse_pos)
 
     def handle_main_menu_events(self, mouse_pos):
         if self.play_button_rect.collidepoint(mouse_pos):
@@ -890,21 +2999,16 @@ class Menu:
         elif self.volume_down_button_rect.collidepoint(mouse_pos):
             settings.change_volume(-0.1)
 
-    def draw_button(self, rect, text):
-        mouse_pos = pygame.mouse.get_pos()
-        color = (180, 20, 20) if rect.collidepoint(mouse_pos) else (160, 160, 160)
+    def draw_button(self, rect, text, hovered=False):
+        color = (180, 20, 20) if hovered else (160, 160, 160)
         pygame.draw.rect(self.screen, color, rect, border_radius=5)
-        font = pygame.font.Font("data/fonts/Melted Monster.ttf", 30)
-        text_rendered = font.render(text, False, (0, 0, 0))
+        text_rendered = text_cache.render("data/fonts/Melted Monster.ttf", 30, text, False, (0, 0, 0))
         self.screen.blit(text_rendered, (rect.centerx - text_rendered.get_width() // 2, rect.centery - text_rendered.get_height() // 2))
 
     def display_instructions(self):
         try:
             with open("data/serialisation/instruction.txt", "r") as file:
                 instructions_text = file.readlines()
-            
-            instructions_font_size = 20 if settings.is_fullscreen else 14
-            instructions_font = pygame.font.Font("data/fonts/BLOODY.ttf", instructions_font_size)
         except FileNotFoundError:
             print("Error: Instructions file not found.")
             return
@@ -912,22 +3016,210 @@ class Menu:
             print("Error:", e)
             return
 
+        instructions_font_size = 14
         y_offset = 540
         for line in instructions_text:
-            instructions_surface = instructions_font.render(line.strip(), True, (190, 190, 190))
+            instructions_surface = text_cache.render("data/fonts/BLOODY.TTF", instructions_font_size, line.strip(), True, (190, 190, 190))
             self.screen.blit(instructions_surface, (50, y_offset))
             y_offset += instructions_surface.get_height() + 5
 
-mixer.init()
-
-while True:
-    if settings.is_menu:
-        mixer.music.load("data/audio/home.mp3")
-        mixer.music.set_volume(settings.volume)
-        mixer.music.play(-1)
-        Menu(screen)
-    elif settings.is_character_selection or settings.is_background_selection:
-        SelectionScreen(screen, mode='character' if settings.is_character_selection else 'background')
-    elif settings.start_game:
-        settings.start_game = False 
-        Game(screen)
+class SceneManager:
+    def __init__(self, screen, scenes, factories=None):
+        self.screen = screen
+        self.scenes = scenes
+        self.factories = factories or {}
+        self.stack = []
+        self.clock = pygame.time.Clock()
+
+    def scene(self, name):
+        if name not in self.scenes and name in self.factories:
+            self.scenes[name] = self.factories[name]()
+        return self.scenes.get(name)
+
+    def push(self, name):
+        scene = self.scene(name)
+        self.stack.append(scene)
+        scene.enter()
+        self.clock.tick()
+
+    def pop(self):
+        scene = self.stack.pop()
+        scene.exit()
+        return scene
+
+    def switch(self, name):
+        while self.stack:
+            self.pop()
+        if name in self.scenes or name in self.factories:
+            self.push(name)
+
+    def route(self):
+        scene = self.stack[-1]
+        if scene.is_active():
+            return
+        if scene is self.scenes.get("game") and self.scene("game_over") is not None:
+            self.scenes["game_over"].score = scene.player.score
+            self.push("game_over")
+        elif settings.start_game:
+            settings.start_game = False
+            self.switch("game")
+        elif settings.is_menu:
+            self.switch("menu")
+        elif settings.is_character_selection or settings.is_background_selection:
+            self.switch("selection")
+        else:
+            self.switch(None)
+
+    def run(self, name):
+        self.switch(name)
+        while self.stack:
+            scene = self.stack[-1]
+            idle = scene.is_idle()
+            if not idle:
+                profiler.begin_frame()
+            start = profiler.start()
+            for event in wait_events(settings.idle_wait) if idle else pygame.event.get():
+                if event.type == pygame.QUIT:
+                    sys.exit()
+                display.handle_event(event)
+                scene.handle_event(event)
+            if not idle:
+                profiler.stop("events", start)
+            scene.update(0 if idle else self.clock.tick(settings.max_fps) / 1000)
+            scene.draw()
+            if idle:
+                self.clock.tick(settings.menu_fps)
+            else:
+                profiler.end_frame()
+            self.route()
+
+def run_headless(games, max_ticks, script=None, character="data/images/Player1.png", seed=None):
+    settings.headless = True
+    settings.selected_character = character
+    headless_screen = init_display(headless=True)
+    results = []
+    start_time = time.perf_counter()
+    for index in range(games):
+        input_source = ScriptedInput.from_file(script) if script else ScriptedInput()
+        game = Game(headless_screen, input_source, headless=True, seed=None if seed is None else seed + index)
+        if settings.record_path:
+            root, extension = os.path.splitext(settings.record_path)
+            path = settings.record_path if games == 1 else f"{root}_{index}{extension}"
+            game.recorder = ReplayRecorder(path, game, input_source)
+            game.input = game.recorder
+        results.append(game.simulate(max_ticks))
+        if game.recorder is not None:
+            game.recorder.close()
+    elapsed = time.perf_counter() - start_time
+    game_scores = [result["score"] for result in results]
+    survival = [result["time"] for result in results]
+    print(f"Simulated {games} games in {elapsed:.2f} s ({games / elapsed * 60:.0f} games/min)")
+    print(f"Score: mean {sum(game_scores) / len(game_scores):.2f}, max {max(game_scores)}")
+    print(f"Survival: mean {sum(survival) / len(survival):.2f} s, max {max(survival):.2f} s")
+    return results
+
+def play_replay(path, seek_tick=0, headless=False):
+    settings.headless = headless
+    replay = Replay(path)
+    screen = init_display(headless=headless)
+    game = replay.create_game(screen, headless=headless)
+    start_time = time.perf_counter()
+    replay.seek(game, seek_tick)
+    if headless:
+        result = game.simulate(replay.end_tick)
+        elapsed = time.perf_counter() - start_time
+        print(f"Replayed {result['ticks']} ticks in {elapsed:.2f} s: score {result['score']}, survived {result['time']:.2f} s")
+        return result
+    SceneManager(screen, {"game": game, "game_over": GameOverScreen(screen)}).run("game")
+
+def print_leaderboard():
+    def name(path):
+        return os.path.splitext(os.path.basename(path))[0] if path else "-"
+
+    print("Top scores:")
+    for rank, entry in enumerate(scores.top(), 1):
+        print(f"{rank:3}. {entry['score']:6}  {name(entry['character']):10} {name(entry['background']):12} wave {entry['wave'] or 0}")
+    for title, boards in (("character", scores.by_character), ("background", scores.by_background)):
+        print(f"Best by {title}:")
+        for key, board in sorted(boards.items(), key=lambda item: -item[1][0]["score"]):
+            print(f"  {name(key):12} {board[0]['score']:6}  ({len(board)} ranked)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Ghost Jump")
+    parser.add_argument("--stress", type=int, default=0, help="spawn this many enemies every wave to stress collision detection")
+    parser.add_argument("--fps", type=int, default=settings.max_fps, help="render frame-rate cap, 0 for uncapped")
+    parser.add_argument("--physics-hz", type=int, default=round(1 / settings.fixed_dt), help="fixed simulation steps per second")
+    parser.add_argument("--gun-rotation-step", type=float, default=settings.gun_rotation_step, metavar="DEGREES", help="angle between cached gun rotations")
+    parser.add_argument("--prebuild-rotations", action="store_true", help="render every cached gun rotation while loading instead of on first use")
+    parser.add_argument("--exact-gun-rotation", action="store_true", help="rotate the gun to the exact aim angle every frame instead of using the cache")
+    parser.add_argument("--no-interpolation", action="store_true", help="draw the latest simulation state without interpolating")
+    parser.add_argument("--full-redraw", action="store_true", help="flip the whole screen every frame instead of updating dirty rectangles")
+    parser.add_argument("--no-batching", action="store_true", help="blit each sprite separately instead of one atlas-backed Surface.blits call")
+    parser.add_argument("--sprite-groups", action="store_true", help="draw collectibles through a pygame.sprite.LayeredDirty group")
+    parser.add_argument("--profile", metavar="PATH", help="record per-phase frame timings and write them to PATH (.json trace events or .csv) when the game ends")
+    parser.add_argument("--numpy-enemies", action="store_true", help="simulate falling enemies as NumPy arrays (requires numpy)")
+    parser.add_argument("--track-surfaces", action="store_true", help="account every loaded or generated Surface; F5 prints live totals per category and call site")
+    parser.add_argument("--surface-budget", type=float, default=0, metavar="MB", help="warn when tracked surfaces exceed this many megabytes")
+    parser.add_argument("--surface-report", metavar="PATH", help="write the surface report to PATH when a game ends (implies --track-surfaces)")
+    parser.add_argument("--headless", action="store_true", help="simulate games without display or audio")
+    parser.add_argument("--games", type=int, default=100, help="number of headless games to simulate")
+    parser.add_argument("--ticks", type=int, default=120 * 60 * 5, help="maximum ticks per headless game")
+    parser.add_argument("--script", help="JSON list of [tick, x, y, clicks] inputs for headless games")
+    parser.add_argument("--seed", type=int, help="seed the game RNG (headless game i uses seed + i)")
+    parser.add_argument("--record", metavar="PATH", help="record inputs and periodic snapshots of each game to PATH")
+    parser.add_argument("--replay", metavar="PATH", help="play back a recorded game")
+    parser.add_argument("--seek", type=int, default=0, help="start replay playback at this tick")
+    parser.add_argument("--speed", type=float, default=1, help="replay playback speed multiplier")
+    parser.add_argument("--startup-time", action="store_true", help="print the time to the first menu frame and exit")
+    parser.add_argument("--leaderboard", action="store_true", help="print the top scores overall and per character and background")
+    args = parser.parse_args()
+    settings.stress_enemies = args.stress
+    settings.max_fps = args.fps
+    settings.fixed_dt = 1 / args.physics_hz
+    if args.games < 1:
+        parser.error("--games must be at least 1")
+    if args.gun_rotation_step <= 0:
+        parser.error("--gun-rotation-step must be positive")
+    settings.gun_rotation_step = args.gun_rotation_step
+    settings.prebuild_rotations = args.prebuild_rotations
+    settings.exact_gun_rotation = args.exact_gun_rotation
+    settings.interpolate = not args.no_interpolation
+    settings.numpy_enemies = args.numpy_enemies
+    settings.dirty_rects = not args.full_redraw
+    settings.batch_sprites = not args.no_batching
+    settings.sprite_groups = args.sprite_groups
+    settings.profile_path = args.profile
+    profiler.enabled = bool(args.profile)
+    surfaces.enabled = args.track_surfaces or bool(args.surface_budget) or bool(args.surface_report)
+    settings.surface_budget = args.surface_budget
+    settings.surface_report_path = args.surface_report
+
+    settings.seed = args.seed
+    settings.record_path = args.record
+    settings.playback_speed = args.speed
+    settings.exit_after_first_frame = args.startup_time
+
+    if args.leaderboard:
+        print_leaderboard()
+        return
+
+    if args.replay:
+        play_replay(args.replay, args.seek, args.headless)
+        return
+
+    if args.headless:
+        run_headless(args.games, args.ticks, args.script, seed=args.seed)
+        return
+
+    screen = init_display()
+    assets.load_bundle()
+
+    factories = {
+        "selection": lambda: SelectionScreen(screen, run=False),
+        "game": lambda: Game(screen, run=False, seed=settings.seed),
+        "game_over": lambda: GameOverScreen(screen)
+    }
+    SceneManager(screen, {"menu": Menu(screen, run=False)}, factories).run("menu")
+
+if __name__ == "__main__":
+    main()